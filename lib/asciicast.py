@@ -0,0 +1,86 @@
+"""Recording and replay of terminal output in asciicast v2 format.
+
+A cast is a JSON header line followed by one `[time, "o", data]` line per flushed frame,
+see https://docs.asciinema.org/manual/asciicast/v2/. `Screen` writes only cells changed
+since the previous frame, so events are frame deltas. Paths ending with '.gz' are gzip-compressed.
+"""
+import gzip
+import json
+import time
+
+from lib.scheduler import FrameScheduler
+from lib.sinks import Sink, StdoutSink
+
+
+def open_cast(path, mode='r'):
+    "Opens cast file at `path` in text `mode` ('r' or 'w'), gzip-compressed if `path` ends with '.gz'."
+    if path.endswith('.gz'):
+        return gzip.open(path, mode + 't', encoding='utf-8')
+    return open(path, mode, encoding='utf-8', newline='\n')
+
+
+class CastSink(Sink):
+    """Records output to cast file at `path`, one event per `flush`. Output also goes to `sink` if given.
+
+    Events are stamped by `clock()`, seconds since creation by default.
+    Scenes set it to their scheduler time, so a cast recorded without waiting is replayed with the original timing.
+    """
+
+    def __init__(self, path, width:int, height:int, sink=None, clock=None):
+        super().__init__()
+        self.sink = sink
+        self._file = open_cast(path, 'w')
+        self._pending = []
+        start = time.monotonic()
+        self.clock = clock or (lambda: time.monotonic() - start)
+        self._file.write(json.dumps({'version': 2, 'width': width, 'height': height}) + '\n')
+
+    def _write(self, s):
+        self._pending.append(s)
+        if self.sink is not None:
+            self.sink.write(s)
+
+    def _flush(self):
+        if self._pending:
+            self._file.write(json.dumps([round(self.clock(), 6), 'o', ''.join(self._pending)], ensure_ascii=False) + '\n')
+            self._pending = []
+        if self.sink is not None:
+            self.sink.flush()
+
+    def close(self):
+        "Writes pending output and closes the file."
+        self._flush()
+        self._file.close()
+
+
+def read(path):
+    "Returns `(header, events)` of cast at `path`, `events` is lazy iterator of `(time, data)` of output events."
+    file = open_cast(path)
+    header = json.loads(file.readline())
+    assert header.get('version') == 2, 'Unsupported asciicast version {!r}'.format(header.get('version'))
+
+    def events():
+        with file:
+            for line in file:
+                if line.strip():
+                    t, kind, data = json.loads(line)
+                    if kind == 'o':
+                        yield t, data
+    return header, events()
+
+
+def replay_steps(events, sink, speed=1.0):
+    "Animation steps (see `FrameScheduler`) writing `events` to `sink` at their times divided by `speed`."
+    last = 0.0
+    for t, data in events:
+        yield (t - last) / speed
+        last = t
+        sink.write(data)
+
+
+def replay(path, sink=None, speed=1.0, fps=60, realtime=True):
+    """Plays cast at `path` to `sink` (standard output by default), returns `FrameStats`.
+    Nothing is computed but the frame timing; events are read as they are due."""
+    sink = sink if sink is not None else StdoutSink()
+    _, events = read(path)
+    return FrameScheduler(fps, present=sink.flush, realtime=realtime).run(replay_steps(events, sink, speed))
@@ -0,0 +1,106 @@
+from collections import OrderedDict
+import hashlib
+import os
+import tempfile
+
+from lib.tenprint import Maze, DEFAULT_SEED, DEFAULT_SIZE, DEFAULT_PATTERN, DEFAULT_RNG
+import lib.mazefile as mazefile
+
+DEFAULT_MAXBYTES = 256 * 2**20
+
+
+class MazeCache(object):
+    """Memoizes analyzed mazes by size, seed, rng mode and pattern.
+
+    Mazes are kept in memory in least-recently-used order while their total `Maze.nbytes()`
+    stays within `maxbytes`. With `directory`, mazes are also stored on disk,
+    the store is trimmed by file age to `disk_maxbytes` (unbounded if `None`).
+    Mazes with `seed=None` are random and never cached.
+    Returned mazes are shared between callers.
+    """
+
+    def __init__(self, maxbytes=DEFAULT_MAXBYTES, directory=None, disk_maxbytes=None):
+        self.maxbytes = maxbytes
+        self.directory = directory
+        self.disk_maxbytes = disk_maxbytes
+        self.hits = self.misses = 0
+        self._mazes = OrderedDict()  # key: (maze, nbytes counted when it was remembered)
+        self._nbytes = 0
+        if directory is not None:
+            os.makedirs(directory, exist_ok=True)
+
+    def get(self, size=DEFAULT_SIZE, seed=DEFAULT_SEED, pattern=DEFAULT_PATTERN, rng=DEFAULT_RNG):
+        "Returns `Maze(size, seed, pattern, rng)`, built only if it is not cached."
+        if seed is None:
+            return Maze(size, seed, pattern, rng)
+
+        key = (tuple(size), seed, rng, pattern.key())
+        entry = self._mazes.get(key)
+        if entry is not None:
+            self._mazes.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+        maze = self._load(key)
+        if maze is None:
+            self.misses += 1
+            maze = Maze(size, seed, pattern, rng)
+            self._store(key, maze)
+        else:
+            self.hits += 1
+        self._remember(key, maze)
+        return maze
+
+    def clear(self):
+        "Forgets mazes kept in memory."
+        self._mazes.clear()
+        self._nbytes = 0
+
+    def __len__(self):
+        return len(self._mazes)
+
+    def _remember(self, key, maze):
+        nbytes = maze.nbytes()
+        if nbytes > self.maxbytes:
+            return
+        self._mazes[key] = (maze, nbytes)
+        self._nbytes += nbytes
+        while self._nbytes > self.maxbytes:
+            _, (_, old_nbytes) = self._mazes.popitem(last=False)
+            self._nbytes -= old_nbytes
+
+    def _path(self, key):
+        return os.path.join(self.directory, hashlib.sha256(repr(key).encode('utf-8')).hexdigest() + '.maze')
+
+    def _load(self, key):
+        if self.directory is None:
+            return None
+        path = self._path(key)
+        if not os.path.exists(path):
+            return None
+        os.utime(path)
+        return mazefile.load(path)
+
+    def _store(self, key, maze):
+        if self.directory is None:
+            return
+        fd, tmp = tempfile.mkstemp(dir=self.directory)
+        os.close(fd)
+        mazefile.save(maze, tmp)
+        os.replace(tmp, self._path(key))
+        self._trim_disk()
+
+    def _trim_disk(self):
+        if self.disk_maxbytes is None:
+            return
+        entries = []
+        for entry in os.scandir(self.directory):
+            if entry.name.endswith('.maze'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.disk_maxbytes:
+                break
+            os.remove(path)
+            total -= size
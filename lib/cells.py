@@ -0,0 +1,257 @@
+import hashlib
+import os
+import random
+import struct
+
+# Two-character cells take one random bit each, cells of `k > 2` characters take a byte `b`
+# (a bit of the same position for two characters), scaled to `b * k >> 8`.
+RNG_V1 = 'v1'  # one `random.random()` draw per cell, same cells as the original generator
+RNG_V2 = 'v2'  # one random bit (or byte) per cell, 32 cells per Mersenne Twister word
+RNG_V3 = 'v3'  # counter-based: cell (i, j) is a bit of keyed BLAKE2b of (i, j // 512), see `region`
+RNG_MODES = (RNG_V1, RNG_V2, RNG_V3)
+
+_V1_CHUNK = 1 << 16    # cells per `getrandbits` call
+_V2_BLOCK = 1 << 13    # bytes per `randbytes` call (8 cells per byte)
+_V3_BLOCK = 512        # cells per digest (64 for `k > 2`)
+_V3_COUNTER = struct.Struct('<qq')
+
+# `random.random() >= 0.5` iff the highest bit of the first of its two 32-bit words is set,
+# which is `_scaled(2)` of its highest byte.
+# _BIT_PLANES[k][b] is k-th bit of byte b.
+_BIT_PLANES = tuple(bytes((b >> k) & 1 for b in range(256)) for k in range(8))
+
+
+def _scaled(k):
+    "Returns translate table of random byte `b` to cell `b * k >> 8`."
+    return bytes(b * k >> 8 for b in range(256))
+
+
+def bits(k:int):
+    "Returns bits per packed cell of `k` characters (1, 2, 4 or 8)."
+    for b in (1, 2, 4, 8):
+        if k <= 1 << b:
+            return b
+    raise ValueError('{} characters do not fit a byte'.format(k))
+
+
+class CellSource(object):
+    """Endless stream of random cell indices (0..k-1) drawn in batches.
+
+    Cells do not depend on how the stream is split by `take`,
+    so a maze can be generated at once or row by row.
+    `RNG_V3` needs `width` of rows to know position of every cell, see `region`.
+    """
+
+    def __init__(self, seed=None, rng=RNG_V1, width=None, k=2):
+        assert rng in RNG_MODES, 'Unknown rng mode {!r}'.format(rng)
+        assert rng != RNG_V3 or width, 'rng mode {!r} needs width'.format(rng)
+        self._rng = rng
+        self._k = k
+        self._table = _scaled(k)
+        self._buffer = bytearray()
+        if rng == RNG_V3:
+            self._key = key(seed)
+            self._width = width
+            self._position = 0
+        else:
+            self._random = random.Random(seed)
+
+    def take(self, n:int):
+        "Returns `bytearray` of next `n` cells."
+        if self._rng == RNG_V1:
+            return self._take_v1(n)
+        if self._rng == RNG_V2:
+            return self._take_v2(n)
+        return self._take_v3(n)
+
+    def _take_v1(self, n):
+        cells = bytearray()
+        while n > 0:
+            m = min(n, _V1_CHUNK)
+            words = self._random.getrandbits(64 * m).to_bytes(8 * m, 'little')
+            cells += words[3::8].translate(self._table)
+            n -= m
+        return cells
+
+    def _take_v2(self, n):
+        buffer = self._buffer
+        while len(buffer) < n:
+            packed = self._random.randbytes(_V2_BLOCK)
+            if self._k > 2:
+                buffer += packed.translate(self._table)
+                continue
+            block = bytearray(8 * _V2_BLOCK)
+            for k, plane in enumerate(_BIT_PLANES):
+                block[k::8] = packed.translate(plane)
+            buffer += block
+        cells = buffer[:n]
+        del buffer[:n]
+        return cells
+
+    def _take_v3(self, n):
+        w, start = self._width, self._position
+        top, stop = start // w, -(-(start + n) // w)
+        self._position += n
+        cells = region(self._key, top, 0, w, stop - top, self._k)
+        return cells[start - top * w:start - top * w + n]
+
+
+def key(seed):
+    """Returns `RNG_V3` key of `seed` (`None` means random key).
+    Functions taking a key also accept seeds, so keys are only worth precomputing for many calls."""
+    if isinstance(seed, _Key):
+        return seed
+    if seed is None:
+        return _Key(os.urandom(32))
+    return _Key(hashlib.blake2b(repr(seed).encode('utf-8'), digest_size=32).digest())
+
+
+class _Key(bytes):
+    pass
+
+
+def region(seed, top:int, left:int, width:int, height:int, k:int=2):
+    """Returns row-major `bytearray` of `RNG_V3` cells of rows `top..top+height-1` and columns `left..left+width-1`.
+
+    Cells depend only on `seed` and their own position, so any part of the unbounded plane
+    (negative positions included) is computed without the rest and independently of other calls.
+    """
+    digest_key = key(seed)
+    per_block = _V3_BLOCK if k == 2 else _V3_BLOCK // 8
+    table = _scaled(k)
+    b0, b1 = left // per_block, (left + width - 1) // per_block + 1
+    skip = left - b0 * per_block
+    cells = bytearray()
+    for i in range(top, top + height):
+        digests = b''.join(
+            hashlib.blake2b(_V3_COUNTER.pack(i, b), key=digest_key, digest_size=64).digest() for b in range(b0, b1)
+        )
+        if k > 2:
+            cells += digests[skip:skip+width].translate(table)
+            continue
+        row = bytearray(8 * len(digests))
+        for bit, plane in enumerate(_BIT_PLANES):
+            row[bit::8] = digests.translate(plane)
+        cells += row[skip:skip+width]
+    return cells
+
+
+def cell(seed, i:int, j:int, k:int=2):
+    "Returns `RNG_V3` cell at row `i` and column `j`."
+    if k > 2:
+        block, byte = divmod(j, _V3_BLOCK // 8)
+        digest = hashlib.blake2b(_V3_COUNTER.pack(i, block), key=key(seed), digest_size=64).digest()
+        return digest[byte] * k >> 8
+    block, bit = divmod(j, _V3_BLOCK)
+    digest = hashlib.blake2b(_V3_COUNTER.pack(i, block), key=key(seed), digest_size=64).digest()
+    return digest[bit // 8] >> (bit % 8) & 1
+
+
+def generate(width:int, height:int, seed=None, rng=RNG_V1, origin=(0, 0), k:int=2):
+    """Returns row-major `bytearray` of `width x height` indices of `k` cell characters.
+    `origin` is position of the top left cell, only `RNG_V3` mazes can start elsewhere than `(0, 0)`."""
+    if rng == RNG_V3:
+        return region(seed, origin[0], origin[1], width, height, k)
+    assert tuple(origin) == (0, 0), 'rng mode {!r} cannot start at {}'.format(rng, origin)
+    return CellSource(seed, rng, k=k).take(width * height)
+
+
+def stride(width:int, bits:int=1):
+    "Returns number of bytes per packed row of `width` cells of `bits` each."
+    per = 8 // bits
+    return (width + per - 1) // per
+
+
+def _shifts(bits):
+    "Returns `tables[q][c]`, cell `c` moved to its place in a byte as `q`-th cell of `bits`."
+    return tuple(bytes((c << (bits * q)) & 0xff for c in range(256)) for q in range(8 // bits))
+
+def _planes(bits):
+    "Returns `tables[q][b]`, `q`-th cell of `bits` of byte `b`."
+    return tuple(bytes((b >> (bits * q)) & ((1 << bits) - 1) for b in range(256)) for q in range(8 // bits))
+
+_SHIFTS = {b: _shifts(b) for b in (1, 2, 4, 8)}
+_PLANES = {b: _planes(b) for b in (1, 2, 4, 8)}
+
+
+def pack(cells, width:int, bits:int=1):
+    """Returns `bytearray` of row-major `cells` packed to `bits` per cell (see `bits`).
+    Every row starts at a byte boundary, cell `j` of a row is `q = j % (8 // bits)`-th group of `bits`
+    (from the lowest) of byte `j // (8 // bits)`."""
+    if not width:
+        return bytearray()
+    per = 8 // bits
+    height = len(cells) // width
+    pad = bytes(stride(width, bits) * per - width)
+    if pad:
+        cells = pad.join(cells[i*width:(i+1)*width] for i in range(height)) + pad
+    packed = 0
+    for q, shift in enumerate(_SHIFTS[bits]):
+        packed |= int.from_bytes(bytes(cells[q::per]).translate(shift), 'little')
+    return bytearray(packed.to_bytes(stride(width, bits) * height, 'little'))
+
+
+def unpack(packed, width:int, start:int=0, stop=None, bits:int=1):
+    "Returns `bytearray` of cells of rows `start..stop-1` packed by `pack`."
+    per = 8 // bits
+    s = stride(width, bits)
+    if not s:
+        return bytearray()
+    stop = len(packed) // s if stop is None else stop
+    chunk = bytes(packed[start*s:stop*s])
+    cells = bytearray(per * len(chunk))
+    for q, plane in enumerate(_PLANES[bits]):
+        cells[q::per] = chunk.translate(plane)
+    if per * s != width:
+        cells = bytearray().join(cells[i*per*s:i*per*s+width] for i in range(stop - start))
+    return cells
+
+
+def get(packed, width:int, i:int, j:int, bits:int=1):
+    "Returns cell `(i, j)` of cells packed by `pack`."
+    per = 8 // bits
+    return packed[i * stride(width, bits) + j // per] >> (bits * (j % per)) & ((1 << bits) - 1)
+
+
+def put(packed, width:int, i:int, j:int, code:int, bits:int=1):
+    "Sets cell `(i, j)` of writable cells packed by `pack` to `code`."
+    per = 8 // bits
+    n, shift = i * stride(width, bits) + j // per, bits * (j % per)
+    packed[n] = packed[n] & ~(((1 << bits) - 1) << shift) & 0xff | code << shift
+
+
+class CharRows(object):
+    """Read-only matrix of maze characters backed by cells packed with `pack`.
+
+    Rows are materialized as `str` on first access, so `rows[i][j]` is a character.
+    `height` is needed only for rows of `width = 0`, which take no bytes.
+    """
+
+    def __init__(self, packed, width:int, chars, height=None):
+        self._packed = packed
+        self._width = width
+        self._bits = bits(len(chars))
+        self._table = dict(enumerate(map(ord, chars)))
+        if height is None:
+            height = len(packed) // stride(width, self._bits)
+        self._rows = [None] * height
+
+    def __len__(self):
+        return len(self._rows)
+
+    def __getitem__(self, i):
+        if isinstance(i, slice):
+            return tuple(self[ii] for ii in range(*i.indices(len(self))))
+        row = self._rows[i]
+        if row is None:
+            i %= len(self._rows)
+            row = unpack(self._packed, self._width, i, i + 1, self._bits).decode('latin-1').translate(self._table)
+            self._rows[i] = row
+        return row
+
+    def __iter__(self):
+        return (self[i] for i in range(len(self)))
+
+    def invalidate(self, i:int):
+        "Drops cached row `i` after its cells changed."
+        self._rows[i] = None
@@ -1,6 +1,36 @@
 def ansi_from_code(code:int):
     return "\u001b[38;5;" + str(code) + "m"
 
+def ansi_from_rgb(rgb):
+    "Returns 24-bit (truecolor) foreground escape of `rgb = (r, g, b)`."
+    return "\u001b[38;2;{};{};{}m".format(*rgb)
+
+
+def _xterm256():
+    system = [
+        (0, 0, 0), (128, 0, 0), (0, 128, 0), (128, 128, 0), (0, 0, 128), (128, 0, 128), (0, 128, 128), (192, 192, 192),
+        (128, 128, 128), (255, 0, 0), (0, 255, 0), (255, 255, 0), (0, 0, 255), (255, 0, 255), (0, 255, 255), (255, 255, 255),
+    ]
+    levels = (0, 95, 135, 175, 215, 255)
+    cube = [(r, g, b) for r in levels for g in levels for b in levels]
+    grays = [(v, v, v) for v in range(8, 248, 10)]
+    return tuple(system + cube + grays)
+
+XTERM256 = _xterm256()  # XTERM256[code] is (r, g, b) of 256-color code
+_nearest = {}
+
+
+def nearest_code(rgb):
+    "Returns 256-color code closest to `rgb = (r, g, b)`. Results are cached."
+    rgb = tuple(rgb)
+    code = _nearest.get(rgb)
+    if code is None:
+        code = _nearest[rgb] = min(
+            range(16, 256),  # system colors vary between terminals
+            key=lambda c: sum((x - y) ** 2 for x, y in zip(XTERM256[c], rgb))
+        )
+    return code
+
 class ANSIColors:
     black = '\u001b[30m'
     red = '\u001b[31m'
@@ -37,20 +67,34 @@ class ANSIColors:
 
 
 class Palette(object):
+    """Finite sequence of foreground colors with precompiled escapes.
+
+    `palette[k]` is escape `str` of color `k`, `palette.encoded[k]` is the same as `bytes`.
+    Components are colored by indices from `indices`, so renderers look escapes up by small integers.
+    """
     _palette = None
 
-    def __init__(self, palette):
+    def __init__(self, palette, truecolor=True):
         """
-        `palette` is finite iterable of ansi-escape sequences (str) or codes of 256 pallete (int)
+        `palette` is finite iterable of ansi-escape sequences (str), codes of 256 pallete (int)
+        or `(r, g, b)` tuples. Without `truecolor` support tuples are replaced by the closest 256-color codes.
         """
-        self._init_palette(palette)  # self._palette
-
-    def _init_palette(self, sequence):
-        if type(sequence[0]) is str:
-            self._palette = tuple(sequence)
-        else:
-            self._palette = tuple(map(ansi_from_code, sequence))
-    
+        self._init_palette(palette, truecolor)  # self._palette
+        self.encoded = tuple(escape.encode('ascii') for escape in self._palette)
+
+    def _init_palette(self, sequence, truecolor):
+        escapes = []
+        for color in sequence:
+            if type(color) is str:
+                escapes.append(color)
+            elif type(color) is int:
+                escapes.append(ansi_from_code(color))
+            elif truecolor:
+                escapes.append(ansi_from_rgb(color))
+            else:
+                escapes.append(ansi_from_code(nearest_code(color)))
+        self._palette = tuple(escapes)
+
     def __getitem__(self, key):
         return self._palette[key]
 
@@ -60,3 +104,12 @@ class Palette(object):
     def sequential(self):
         "Returns palette."
         return self._palette
+
+    def indices(self, labels):
+        """Returns `bytes` of color index `label % len(self)` of every label of `labels`.
+        Byte labels (`bytes`, `array` of typecode 'B' or `memoryview` of format 'B') are translated in one call."""
+        n = len(self._palette)
+        assert n <= 256, 'Palette of {} colors does not fit byte indices'.format(n)
+        if isinstance(labels, (bytes, bytearray)) or getattr(labels, 'typecode', getattr(labels, 'format', None)) == 'B':
+            return bytes(labels).translate(bytes(c % n for c in range(256)))
+        return bytes(map(n.__rmod__, labels))
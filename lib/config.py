@@ -1,5 +1,6 @@
 DEFAULT_MAZE_SEED = 1
 DEFAULT_MAZE_SIZE = (80, 28)
+DEFAULT_MAZE_RNG = 'v1'
 DEFAULT_MAZE_CHARS = ('╱', '╲')
 DEFAULT_MAZE_CONNECTIVITY_PATTERN = ('x╲╱╲╱╲╱╲x', '╲╱x╱╲╱x╱╲')
 DEFAULT_MAZE_CONNECTIVITY_PATTERN_FILL = 'x'
@@ -0,0 +1,284 @@
+from array import array
+from collections import Counter, namedtuple
+from itertools import compress
+
+
+def typecode(n:int):
+    "Returns smallest unsigned `array` typecode holding values `0..n`."
+    for code in ('B', 'H', 'I', 'Q'):
+        if n < 1 << (8 * array(code).itemsize):
+            return code
+    raise OverflowError('{} does not fit any array typecode'.format(n))
+
+
+def label(masks, width:int, height:int, offsets, symmetric=True, stats=False):
+    """Labels connectivity components of a grid of neighbour bitmasks (see `CompiledPattern`).
+
+    Scanline union-find (Hoshen-Kopelman): every cell is united with the neighbours of its mask,
+    roots are always the smallest index of their set. Components are treated as undirected;
+    for `symmetric` patterns it is enough to look at neighbours preceding the cell.
+    Returns `(labels, count)`, where `labels` is row-major `array` of component indices
+    numbered in order of the first cell of each component.
+    With `stats` returns `(labels, count, ComponentStats)`, collected by the same relabeling pass.
+    """
+    n = width * height
+    parent = array(typecode(n), range(n))
+
+    steps = [
+        (1 << k, di * width + dj) for k, (di, dj) in enumerate(offsets)
+        if not symmetric or (di, dj) < (0, 0)
+    ]
+    moves = step_table(steps, len(offsets))
+    if len(offsets) <= 8:
+        active = bytes(masks).translate(bytes(1 if moves[m] else 0 for m in range(256)))
+    else:
+        active = masks  # cells with forward edges only are few
+
+    for u in compress(range(n), active):
+        for d in moves[masks[u]]:
+            a, b = u, u + d
+            while parent[a] != a:
+                parent[a] = a = parent[parent[a]]
+            while parent[b] != b:
+                parent[b] = b = parent[parent[b]]
+            if a < b:
+                parent[b] = a
+            elif b < a:
+                parent[a] = b
+
+    # parent[u] <= u, so labels of parents are already known
+    count = 0
+    if not stats:
+        for u in range(n):
+            p = parent[u]
+            if p == u:
+                parent[u] = count
+                count += 1
+            else:
+                parent[u] = parent[p]
+        return array(typecode(count), parent), count
+
+    # rows only grow during the scan, so bottom is the last row seen
+    sizes, top, left, bottom, right = [], [], [], [], []
+    u = 0
+    for i in range(height):
+        for j in range(width):
+            p = parent[u]
+            if p == u:
+                parent[u] = count
+                count += 1
+                sizes.append(1)
+                top.append(i)
+                left.append(j)
+                bottom.append(i)
+                right.append(j)
+            else:
+                c = parent[u] = parent[p]
+                sizes[c] += 1
+                bottom[c] = i
+                if j < left[c]:
+                    left[c] = j
+                elif j > right[c]:
+                    right[c] = j
+            u += 1
+
+    return array(typecode(count), parent), count, ComponentStats(width, height, sizes, top, left, bottom, right)
+
+
+ComponentInfo = namedtuple('ComponentInfo', ('size', 'top', 'left', 'bottom', 'right'))
+
+
+class ComponentStats(object):
+    """Sizes and bounding boxes of components of a `width x height` grid, indexed by label.
+
+    Columns `sizes`, `top`, `left`, `bottom` and `right` (inclusive) are `array`s.
+    The size histogram is kept up to date, largest and spanning components are found
+    on first query after a change, so queries do not go over the grid again.
+    Labels of components removed by `set` have size 0 and are left out of the queries.
+    """
+
+    def __init__(self, width:int, height:int, sizes, top, left, bottom, right):
+        self.width = width
+        self.height = height
+        self.sizes = array(typecode(width * height), sizes)
+        code = typecode(max(width, height))
+        self.top, self.left, self.bottom, self.right = (array(code, column) for column in (top, left, bottom, right))
+
+        self.histogram = Counter(self.sizes)  # size: number of components
+        self.histogram.pop(0, None)
+        self._extremes = None  # (largest, vertical, horizontal)
+
+    @classmethod
+    def from_labels(cls, labels, count:int, width:int, height:int):
+        "Returns stats of row-major component `labels` (when labeling did not collect them)."
+        sizes, top, left, bottom, right = [0] * count, [height] * count, [width] * count, [0] * count, [0] * count
+        u = 0
+        for i in range(height):
+            for j in range(width):
+                c = labels[u]
+                if not sizes[c]:
+                    top[c], left[c], right[c] = i, j, j
+                sizes[c] += 1
+                bottom[c] = i
+                if j < left[c]:
+                    left[c] = j
+                elif j > right[c]:
+                    right[c] = j
+                u += 1
+        return cls(width, height, sizes, top, left, bottom, right)
+
+    @classmethod
+    def merged(cls, parts, count:int, width:int, height:int):
+        """Returns stats of components made of parts of tiles.
+        `parts` are `(stats, mapping, row)`: stats of a tile starting at `row`, `mapping[label]` is the component of a tile label."""
+        sizes, top, left, bottom, right = [0] * count, [height] * count, [width] * count, [0] * count, [0] * count
+        for stats, mapping, row in parts:
+            for a, c in enumerate(mapping):
+                sizes[c] += stats.sizes[a]
+                top[c] = min(top[c], row + stats.top[a])
+                left[c] = min(left[c], stats.left[a])
+                bottom[c] = max(bottom[c], row + stats.bottom[a])
+                right[c] = max(right[c], stats.right[a])
+        return cls(width, height, sizes, top, left, bottom, right)
+
+    def remapped(self, mapping, count:int):
+        "Returns stats with label `c` renamed to `mapping[c]` (`None` for removed labels)."
+        columns = [[0] * count for _ in range(5)]
+        for c, m in enumerate(mapping):
+            if m is not None:
+                for column, values in zip(columns, (self.sizes, self.top, self.left, self.bottom, self.right)):
+                    column[m] = values[c]
+        return ComponentStats(self.width, self.height, *columns)
+
+    def __len__(self):
+        return len(self.sizes)
+
+    def __getitem__(self, c:int):
+        return ComponentInfo(self.sizes[c], self.top[c], self.left[c], self.bottom[c], self.right[c])
+
+    def set(self, c:int, size:int, top=0, left=0, bottom=0, right=0):
+        "Sets stats of label `c`, `len(self)` adds a label. Size 0 removes the component."
+        if c == len(self.sizes):
+            for column in (self.sizes, self.top, self.left, self.bottom, self.right):
+                column.append(0)
+        old = self.sizes[c]
+        if old:
+            self.histogram[old] -= 1
+            if not self.histogram[old]:
+                del self.histogram[old]
+        if size:
+            self.histogram[size] += 1
+        self.sizes[c], self.top[c], self.left[c], self.bottom[c], self.right[c] = size, top, left, bottom, right
+        self._extremes = None
+
+    @property
+    def largest(self):
+        "Label of the largest component (the first one of equal ones), `None` for empty grid."
+        return self._find_extremes()[0]
+
+    @property
+    def vertical(self):
+        "Labels of components touching top and bottom border."
+        return self._find_extremes()[1]
+
+    @property
+    def horizontal(self):
+        "Labels of components touching left and right border."
+        return self._find_extremes()[2]
+
+    def _find_extremes(self):
+        if self._extremes is None:
+            live = [c for c in range(len(self.sizes)) if self.sizes[c]]
+            self._extremes = (
+                max(live, key=self.sizes.__getitem__, default=None),
+                tuple(c for c in live if self.top[c] == 0 and self.bottom[c] == self.height - 1),
+                tuple(c for c in live if self.left[c] == 0 and self.right[c] == self.width - 1),
+            )
+        return self._extremes
+
+    def touches(self, c:int):
+        "Returns `(top, right, bottom, left)` flags of borders touched by component `c`."
+        return (self.top[c] == 0, self.right[c] == self.width - 1, self.bottom[c] == self.height - 1, self.left[c] == 0)
+
+    def spans(self):
+        "Returns whether some component connects top and bottom border."
+        return bool(self.vertical)
+
+    def ranking(self):
+        "Returns labels ordered by size, largest first (ties in label order)."
+        return sorted((c for c in range(len(self.sizes)) if self.sizes[c]), key=self.sizes.__getitem__, reverse=True)
+
+
+def step_table(steps, nbits:int):
+    """Returns `moves[mask]`, tuple of steps `d` of `steps = [(bit, d), ...]` with bits set in `mask`.
+    Masks of up to 8 bits get a list, wider ones a `dict` filled on demand."""
+    if nbits <= 8:
+        return [tuple(d for bit, d in steps if m & bit) for m in range(256)]
+    return _StepTable(steps)
+
+
+class _StepTable(dict):
+    def __init__(self, steps):
+        super().__init__()
+        self._steps = steps
+
+    def __missing__(self, mask):
+        moves = self[mask] = tuple(d for bit, d in self._steps if mask & bit)
+        return moves
+
+
+def waves(masks, labels, count:int, width:int, offsets):
+    """Orders cells of every component breadth-first from its first cell, in one pass over the grid.
+
+    Bit `b` of a mask is set for neighbour at `offsets[b] = (di, dj)` (see `CompiledPattern`).
+    Returns `(order, depths, offsets)`: cells of component `c` are `order[offsets[c]:offsets[c+1]]`
+    in order of non-decreasing distance `depths` from the first cell. Cells not reachable
+    from the first cell of their component (only for asymmetric patterns) start waves of their own,
+    which follow in the same slice with depths counted from 0 again.
+    """
+    n = len(labels)
+    steps = step_table([(1 << b, di * width + dj) for b, (di, dj) in enumerate(offsets)], len(offsets))
+    visited = bytearray(n)
+    queue = array(typecode(n))
+    depth = array(typecode(n), bytes(n * array(typecode(n)).itemsize))
+
+    # all components at once, starting from their first cells
+    for u, label in enumerate(labels):
+        if label == len(queue):
+            queue.append(u)
+            visited[u] = 1
+            if len(queue) == count:
+                break
+
+    head = unvisited = 0
+    while True:
+        while head < len(queue):
+            u = queue[head]
+            head += 1
+            for d in steps[masks[u]]:
+                v = u + d
+                if not visited[v]:
+                    visited[v] = 1
+                    depth[v] = depth[u] + 1
+                    queue.append(v)
+        if len(queue) == n:
+            break
+        u = unvisited = visited.index(0, unvisited)
+        visited[u] = 1
+        queue.append(u)
+
+    # stable counting sort by component keeps breadth-first order inside components
+    offsets = [0] * (count + 1)
+    for label in labels:
+        offsets[label + 1] += 1
+    for c in range(count):
+        offsets[c + 1] += offsets[c]
+    fill = offsets[:-1]
+    order = array(queue.typecode, bytes(n * queue.itemsize))
+    depths = array(depth.typecode, bytes(n * depth.itemsize))
+    for u in queue:
+        c = labels[u]
+        order[fill[c]] = u
+        depths[fill[c]] = depth[u]
+        fill[c] += 1
+    return order, depths, offsets
@@ -0,0 +1,102 @@
+"""Binary maze format.
+
+Little-endian layout:
+    header      see `_HEADER`: magic, version, size, number of components,
+                label and mask typecodes, length of pattern and (offset, length) of every section;
+    pattern     JSON of `chars`, `fill` and `pattern` of `MazePattern`;
+    cells       cells packed by `lib.cells.pack`;
+    masks       neighbour bitmask of every cell, `array` of the typecode from the header;
+    labels      component label of every cell, `array` of the typecode from the header.
+Sections start at 8-byte boundaries, so they can be used in place from memory-mapped file.
+"""
+from array import array
+import json
+import mmap
+import os
+import struct
+import sys
+import tempfile
+
+from lib.tenprint import Maze, _typecode
+from lib.mazepattern import MazePattern
+
+MAGIC = b'10PRINT\x00'
+VERSION = 2  # version 1 had no mask typecode (a pad byte, masks were bytes)
+
+_HEADER = struct.Struct('<8sHxxIIQccxxI6Q')
+_ALIGN = 8
+
+
+def save(maze:Maze, path):
+    """Writes analyzed `maze` to file at `path`.
+    The file is written next to `path` and moved in place, so `path` is never left half-written."""
+    maze.analyze()
+    chars, fill, pattern = maze._pattern.key()
+    meta = json.dumps({'chars': chars, 'fill': fill, 'pattern': pattern}, ensure_ascii=False).encode('utf-8')
+
+    labels, masks = maze._labels, maze._masks
+    labels_typecode, masks_typecode = _typecode(labels), _typecode(masks)
+    if sys.byteorder == 'big':
+        labels = array(labels_typecode, labels)
+        labels.byteswap()
+        masks = array(masks_typecode, masks)
+        masks.byteswap()
+    sections = [bytes(maze._cells), bytes(masks), bytes(labels)]
+
+    offset = _aligned(_HEADER.size + len(meta))
+    bounds = []
+    for section in sections:
+        bounds += [offset, len(section)]
+        offset = _aligned(offset + len(section))
+
+    header = _HEADER.pack(
+        MAGIC, VERSION, maze.size.width, maze.size.height, maze._ncomponents,
+        labels_typecode.encode('ascii'), masks_typecode.encode('ascii'), len(meta), *bounds
+    )
+    fd, tmp = tempfile.mkstemp(dir=os.path.dirname(os.path.abspath(path)), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(header)
+            f.write(meta)
+            for section, start in zip(sections, bounds[::2]):
+                f.write(bytes(start - f.tell()))
+                f.write(section)
+        os.replace(tmp, path)
+    except BaseException:
+        os.unlink(tmp)
+        raise
+
+
+def load(path):
+    """Returns `Maze` from file at `path`.
+    Buffers of the maze are read-only views of the memory-mapped file."""
+    with open(path, 'rb') as f:
+        data = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+
+    magic, version, width, height, ncomponents, typecode, masks_typecode, meta_len, *bounds = _HEADER.unpack_from(data)
+    if magic != MAGIC:
+        raise ValueError('{} is not a maze file'.format(path))
+    if version not in (1, VERSION):
+        raise ValueError('Unsupported maze file version {}'.format(version))
+    if version == 1:
+        masks_typecode = b'B'
+
+
+    meta = json.loads(bytes(data[_HEADER.size:_HEADER.size + meta_len]).decode('utf-8'))
+    pattern = MazePattern(chars=tuple(meta['chars']), fill=meta['fill'], pattern=tuple(meta['pattern']))
+
+    cells, masks, labels = (data[start:start+length] for start, length in zip(bounds[::2], bounds[1::2]))
+    labels = labels.cast(typecode.decode('ascii'))
+    if masks_typecode != b'B':
+        masks = masks.cast(masks_typecode.decode('ascii'))
+    if sys.byteorder == 'big':
+        labels = array(labels.format, labels)
+        labels.byteswap()
+        if masks_typecode != b'B':
+            masks = array(masks.format, masks)
+            masks.byteswap()
+    return Maze.from_buffers((width, height), pattern, cells, masks, labels, ncomponents)
+
+
+def _aligned(offset):
+    return -(-offset // _ALIGN) * _ALIGN
@@ -1,9 +1,16 @@
+from array import array
 import lib.config as config
 import logging
+import math
+import sys
 
 
 class MazePattern(object):
-    "Describes connectivity pattern of maze."
+    """Describes connectivity pattern of maze.
+
+    Maze consists of `k = len(chars)` characters, `pattern[c]` is a row-major window of side `2 * radius + 1`
+    around character `chars[c]`: position of the window connects to the center if it holds the same character.
+    """
     
     def __init__(self,
         chars=config.DEFAULT_MAZE_CHARS,
@@ -11,10 +18,16 @@ class MazePattern(object):
         pattern=config.DEFAULT_MAZE_CONNECTIVITY_PATTERN):
 
         if fill in chars: logging.warning('Fill character matches maze character.')
+        assert len(chars) >= 2 and len(pattern) == len(chars), 'Pattern must have a window for each of 2 or more characters.'
+        side = math.isqrt(len(pattern[0]))
+        assert side % 2 == 1 and all(len(window) == side * side for window in pattern), \
+            'Pattern windows must be squares of odd side.'
 
         self._chars = chars
         self._fill = fill
         self._pattern = pattern
+        self._radius = side // 2
+        self._compiled = None
 
     def __str__(self):
         return '{}(chars={}, fill=\'{}\', pattern=\'{}\')'.format(
@@ -24,25 +37,32 @@ class MazePattern(object):
             self._pattern
         )
 
+    def key(self):
+        "Returns hashable description of the pattern."
+        return (tuple(self._chars), self._fill, tuple(self._pattern))
+
     def adjacent(self, window, is_matrix=False):
         """
         Calculates connected positions relative to center of `window`.
-        `window` must be 3x3 matrix-like object of chars or string of 9 characters (row-major).
-        This behaviour defined by `is_matrix`.
+        `window` must be square matrix-like object of chars of the pattern size (3x3 by default)
+        or row-major string of its characters. This behaviour defined by `is_matrix`.
 
         Tip: for outside cells of global maze fill `window` with `self.fill()` character.
         """
         if is_matrix:
             window = self._join_matrix_to_str(window)
 
+        r = self._radius
+        side = 2 * r + 1
+        center = len(window) // 2
         adj = []
-        pattern = self._pattern[ self._chars.index(window[4]) ]
+        pattern = self._pattern[ self._chars.index(window[center]) ]
 
         for n, char in enumerate(window):
-            if n == 4 or window[n] == self._fill:  # skipping center and fill chars
+            if n == center or window[n] == self._fill:  # skipping center and fill chars
                 continue
             if window[n] == pattern[n]:
-                di, dj = n // 3 - 1, n % 3 - 1  # relative position to center (1, 1)
+                di, dj = n // side - r, n % side - r  # relative position to center
                 adj.append((di, dj))
         return adj
 
@@ -51,8 +71,149 @@ class MazePattern(object):
         s = ''.join(''.join(row) for row in matrix)
         return s
 
+    def compile(self):
+        "Returns `CompiledPattern` of this pattern. The result is cached."
+        if self._compiled is None:
+            self._compiled = CompiledPattern(self)
+        return self._compiled
+
     def chars(self):
         return self._chars
 
     def fill(self):
         return self._fill
+
+    def radius(self):
+        return self._radius
+
+
+class CompiledPattern(object):
+    """Lookup-table form of `MazePattern`.
+
+    Cells are encoded as indices `0..k-1` of `MazePattern.chars()`, `FILL = k` stands for outside cells.
+    Neighbour bitmask of a cell has bit `b` set when it is adjacent to the cell at `offsets[b]`.
+    Masks are bytes for 3x3 windows and `array` items of `typecode` for larger ones.
+    Contribution of every window position depends only on the center and that position,
+    so the window table factors into one table per position, indexed by `(k + 1) * center + cell`.
+    """
+
+    def __init__(self, pattern:MazePattern):
+        self.k = len(pattern.chars())
+        self.radius = r = pattern.radius()
+        assert (self.k + 1) * self.k < 256, 'Compiled patterns support up to 15 characters.'
+        self.FILL = self.k  # code of outside cells
+        side = 2 * r + 1
+        self.offsets = tuple((n // side - r, n % side - r) for n in range(side * side) if n != side * side // 2)
+        self.typecode = next((code for code in ('B', 'H', 'I', 'Q') if 8 * array(code).itemsize >= len(self.offsets)), None)
+        assert self.typecode is not None, 'Compiled patterns support radius up to 3.'
+        if len(self.offsets) <= 8:
+            self.moves = tuple(  # moves[mask] is tuple of offsets of set bits
+                tuple(offset for b, offset in enumerate(self.offsets) if mask >> b & 1) for mask in range(256)
+            )
+        else:
+            self.moves = _Moves(self.offsets)
+        self._times = bytes(min((self.k + 1) * c, 255) for c in range(256))
+        self._tables = self._init_tables(pattern)
+        self.symmetric = self._is_symmetric()
+
+    def _init_tables(self, pattern):
+        "Returns translate table of every offset, giving its mask bit within its byte (lane `b // 8`)."
+        codes = list(pattern.chars()) + [pattern.fill()]
+        side = 2 * self.radius + 1
+        tables = []
+        for b, (di, dj) in enumerate(self.offsets):
+            n = (di + self.radius) * side + dj + self.radius
+            table = bytearray(256)
+            for center in range(self.k):
+                for cell in range(self.k + 1):
+                    window = [pattern.fill()] * (side * side)
+                    window[side * side // 2], window[n] = codes[center], codes[cell]
+                    if (di, dj) in pattern.adjacent(window):
+                        table[(self.k + 1) * center + cell] = 1 << (b % 8)
+            tables.append(bytes(table))
+        return tuple(tables)
+
+    def _is_symmetric(self):
+        k1 = self.k + 1
+        for b, (di, dj) in enumerate(self.offsets):
+            rb = self.offsets.index((-di, -dj))
+            for center in range(self.k):
+                for cell in range(self.k):
+                    if bool(self._tables[b][k1*center + cell]) != bool(self._tables[rb][k1*cell + center]):
+                        return False
+        return True
+
+    def mask(self, window):
+        "Returns neighbour bitmask of center of `window`, row-major sequence of codes of the pattern window size."
+        center = (self.k + 1) * window[len(window) // 2]
+        side = 2 * self.radius + 1
+        m = 0
+        for b, ((di, dj), table) in enumerate(zip(self.offsets, self._tables)):
+            m |= table[center + window[(di + self.radius) * side + dj + self.radius]] << (8 * (b // 8))
+        return m
+
+    def masks(self, cells, width:int, height:int, above=None, below=None):
+        """Returns neighbour bitmasks for row-major `cells` of `width x height`,
+        `bytearray` for 3x3 windows and `array` of `typecode` otherwise.
+        Up to `radius` rows `above` and `below` the grid (nearest last and first) are given as row-major cells,
+        missing rows are filled with `FILL`."""
+        if not width:
+            return bytearray() if self.typecode == 'B' else array(self.typecode)
+        r = self.radius
+        fill = bytes([self.FILL])
+        blank = fill * width
+        above = b'' if above is None else bytes(above)
+        below = b'' if below is None else bytes(below)
+        rows = [blank] * (r - len(above) // width)
+        rows.extend(above[i*width:(i+1)*width] for i in range(len(above) // width))
+        rows.extend(bytes(cells[i*width:(i+1)*width]) for i in range(height))
+        rows.extend(below[i*width:(i+1)*width] for i in range(len(below) // width))
+        rows.extend([blank] * (r - len(below) // width))
+
+        # ghost grid has `r` fill columns on each side of every row and `r` guard bytes on each end
+        W = width + 2 * r
+        ghost = fill * r + b''.join(fill * r + row + fill * r for row in rows) + fill * r
+        start, n = r + r * W, height * W
+
+        center = int.from_bytes(ghost[start:start+n].translate(self._times), 'little')
+        lanes = [0] * ((len(self.offsets) + 7) // 8)
+        for b, ((di, dj), table) in enumerate(zip(self.offsets, self._tables)):
+            s = start + di * W + dj
+            codes = center + int.from_bytes(ghost[s:s+n], 'little')
+            lanes[b // 8] |= int.from_bytes(codes.to_bytes(n, 'little').translate(table), 'little')
+
+        bands = [lane.to_bytes(n, 'little') for lane in lanes]
+        if len(bands) == 1:
+            masks = bytearray()
+            for i in range(height):
+                masks += bands[0][i*W+r:i*W+r+width]
+            return masks
+
+        itemsize = array(self.typecode).itemsize
+        out = bytearray(itemsize * width * height)
+        for lane, band in enumerate(bands):
+            out[lane::itemsize] = b''.join(band[i*W+r:i*W+r+width] for i in range(height))
+        masks = array(self.typecode, bytes(out))
+        if sys.byteorder == 'big':
+            masks.byteswap()
+        return masks
+
+
+class _Moves(dict):
+    "Offsets of set bits of wide masks, computed on first use of every mask."
+
+    def __init__(self, offsets):
+        super().__init__()
+        self._offsets = offsets
+
+    def __missing__(self, mask):
+        moves = self[mask] = tuple(offset for b, offset in enumerate(self._offsets) if mask >> b & 1)
+        return moves
+
+
+# patterns known by name to command line tools
+PATTERNS = {
+    '10print': MazePattern(),
+    'blocks4': MazePattern(chars=('█', ' '), fill='x', pattern=('x█x███x█x', 'x x   x x')),
+    'blocks8': MazePattern(chars=('█', ' '), fill='x', pattern=('█' * 9, ' ' * 9)),
+}
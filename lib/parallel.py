@@ -0,0 +1,127 @@
+from array import array
+from bisect import bisect_right
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+import os
+
+from lib.tenprint import Maze, DEFAULT_SEED, DEFAULT_SIZE, DEFAULT_PATTERN, DEFAULT_RNG
+import lib.cells as cells
+import lib.labeling as labeling
+
+
+def build(size=DEFAULT_SIZE, seed=DEFAULT_SEED, pattern=DEFAULT_PATTERN, rng=DEFAULT_RNG, workers=None, tiles=None,
+        origin=(0, 0), threads=False):
+    """Returns `Maze` built by labeling horizontal tiles in a process pool (thread pool if `threads`).
+
+    Every tile (with the rows around it) goes to a worker, which computes neighbour masks and labels
+    the tile on its own. Cells of `rng='v3'` are generated by the workers, other modes are generated
+    in the calling process. Tile labels are then merged across seams with union-find and renumbered,
+    so the result is identical to `Maze(size, seed, pattern, rng, origin=origin)`.
+    """
+    w, h = size
+    if not w or not h:
+        return Maze(size, seed, pattern, rng, origin=origin)
+    compiled = pattern.compile()
+    r = compiled.radius
+    workers = workers or os.cpu_count() or 1
+    tiles = max(min(tiles or workers, h // r), 1)
+    step = -(-h // tiles)
+    bounds = [(r0, min(r0 + step, h)) for r0 in range(0, h, step)]
+
+    if rng == cells.RNG_V3:
+        key = cells.key(seed)
+        tasks = [(None, key, origin, w, h, r0, r1, pattern) for r0, r1 in bounds]
+    else:
+        unpacked = cells.generate(w, h, seed, rng, origin, compiled.k)
+        tasks = [(unpacked[max(r0-r, 0)*w:min(r1+r, h)*w], None, origin, w, h, r0, r1, pattern) for r0, r1 in bounds]
+
+    if len(tasks) > 1 and workers > 1:
+        with (ThreadPoolExecutor if threads else ProcessPoolExecutor)(max_workers=workers) as executor:
+            results = list(executor.map(_label_tile, tasks))
+    else:
+        results = list(map(_label_tile, tasks))
+
+    packed = bytearray().join(result[0] for result in results)
+    masks = results[0][1][:0]
+    for result in results:
+        masks += result[1]
+    labels, count, mappings = _merge([result[1:4] for result in results], w, compiled, bounds)
+    stats = labeling.ComponentStats.merged(
+        [(result[4], mapping, r0) for result, mapping, (r0, _) in zip(results, mappings, bounds)], count, w, h
+    )
+    return Maze.from_buffers(size, pattern, packed, masks, labels, count, stats)
+
+
+def _label_tile(task):
+    band, key, origin, width, height, r0, r1, pattern = task
+    compiled = pattern.compile()
+    r = compiled.radius
+    top, bottom = max(r0 - r, 0), min(r1 + r, height)
+    if band is None:
+        band = cells.region(key, origin[0] + top, origin[1], width, bottom - top, compiled.k)
+    tile = band[(r0-top)*width:(r1-top)*width]
+    above = band[:(r0-top)*width] or None
+    below = band[(r1-top)*width:] or None
+
+    masks = compiled.masks(tile, width, r1 - r0, above, below)
+    inner = _without_leaving(masks, width, r1 - r0, compiled)
+    labels, count, stats = labeling.label(inner, width, r1 - r0, compiled.offsets, compiled.symmetric, stats=True)
+    return cells.pack(tile, width, cells.bits(compiled.k)), masks, labels, count, stats
+
+
+def _without_leaving(masks, width, height, compiled):
+    "Returns copy of `masks` of a tile without edges leaving it, they are left for the seam merge."
+    r = compiled.radius
+    inner = masks[:]
+    for t in sorted(set(range(min(r, height))) | set(range(max(height - r, 0), height))):
+        keep = sum(1 << b for b, (di, _) in enumerate(compiled.offsets) if 0 <= t + di < height)
+        row = inner[t*width:(t+1)*width]
+        if isinstance(inner, bytearray):
+            inner[t*width:(t+1)*width] = row.translate(bytes(m & keep for m in range(256)))
+        else:
+            inner[t*width:(t+1)*width] = array(inner.typecode, (m & keep for m in row))
+    return inner
+
+
+def _merge(results, width, compiled, bounds):
+    """Unites tile labels along seams, returns global `(labels, count, mappings)` numbered by first cell.
+    `results` are `(masks, labels, count)` of tiles of rows `bounds`, `mappings[t][label]` is global label of a label of tile `t`."""
+    offsets = [0]
+    for _, _, count in results:
+        offsets.append(offsets[-1] + count)
+    parent = list(range(offsets[-1]))
+    starts = [r0 for r0, _ in bounds]
+    r = compiled.radius
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = a = parent[parent[a]]
+        return a
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    # edges leaving the first and last rows of every tile
+    for t, ((masks, labels, _), (r0, r1)) in enumerate(zip(results, bounds)):
+        for i in sorted(set(range(r0, min(r0 + r, r1))) | set(range(max(r1 - r, r0), r1))):
+            for j in range(width):
+                u = (i - r0) * width + j
+                for di, dj in compiled.moves[masks[u]]:
+                    if not r0 <= i + di < r1:
+                        s = bisect_right(starts, i + di) - 1
+                        v = (i + di - starts[s]) * width + j + dj
+                        union(offsets[t] + labels[u], offsets[s] + results[s][1][v])
+
+    # tiles are in scan order and tile labels are numbered by first cell,
+    # so the first node of every root is met in scan order of the whole maze
+    final = {}
+    mappings = []
+    for t in range(len(results)):
+        mappings.append([final.setdefault(find(node), len(final)) for node in range(offsets[t], offsets[t+1])])
+
+    count = len(final)
+    labels = array(labeling.typecode(count))
+    for (_, tile_labels, _), mapping in zip(results, mappings):
+        labels.extend(map(mapping.__getitem__, tile_labels))
+    return labels, count, mappings
@@ -0,0 +1,129 @@
+import time
+import tracemalloc
+
+_active = None  # `Profiler` collecting measurements, if any
+
+
+class Profiler(object):
+    """Collects wall time (and optionally allocation peaks) of named phases and counters.
+
+    Instrumented code calls `phase` and `count` of this module; they do nothing unless a profiler is active:
+
+        with Profiler(memory=True) as profiler:
+            Maze((1000, 1000))
+        print(profiler.format())
+
+    Callbacks added by `subscribe` are called as `callback(name, seconds, peak_bytes)` after every phase.
+    Phases may nest, peak of a phase includes peaks of the phases inside it.
+    """
+
+    def __init__(self, memory=False):
+        self.memory = memory
+        self.phases = {}    # name: [calls, seconds, peak bytes]
+        self.counters = {}  # name: value
+        self._callbacks = []
+        self._previous = None
+        self._tracing = False  # whether `__enter__` started tracemalloc
+        self._peaks = []       # absolute allocation peaks of open phases, before their inner phases reset it
+
+    def __enter__(self):
+        global _active
+        self._previous, _active = _active, self
+        if self.memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+            self._tracing = True
+        return self
+
+    def __exit__(self, *exc):
+        global _active
+        _active = self._previous
+        if self._tracing:
+            tracemalloc.stop()
+            self._tracing = False
+
+    def subscribe(self, callback):
+        self._callbacks.append(callback)
+
+    def record(self, name, seconds, peak=0):
+        entry = self.phases.setdefault(name, [0, 0.0, 0])
+        entry[0] += 1
+        entry[1] += seconds
+        entry[2] = max(entry[2], peak)
+        for callback in self._callbacks:
+            callback(name, seconds, peak)
+
+    def add(self, name, value=1):
+        self.counters[name] = self.counters.get(name, 0) + value
+
+    def report(self):
+        "Returns measurements as `dict` ready for JSON."
+        phases = {}
+        for name, (calls, seconds, peak) in self.phases.items():
+            phases[name] = {'calls': calls, 'time': seconds}
+            if self.memory:
+                phases[name]['peak_memory'] = peak
+        return {'phases': phases, 'counters': dict(self.counters)}
+
+    def format(self):
+        "Returns measurements as text table."
+        lines = ['{:<24} {:>7} {:>11} {:>14}'.format('phase', 'calls', 'time, s', 'peak, B')]
+        for name, (calls, seconds, peak) in self.phases.items():
+            lines.append('{:<24} {:>7} {:>11.4f} {:>14}'.format(name, calls, seconds, peak if self.memory else '-'))
+        for name, value in self.counters.items():
+            lines.append('{:<24} {:>7}'.format(name, value))
+        return '\n'.join(lines)
+
+
+class _Phase(object):
+    def __init__(self, profiler, name):
+        self._profiler = profiler
+        self._name = name
+
+    def __enter__(self):
+        if self._profiler.memory:
+            peaks = self._profiler._peaks
+            self._base, peak = tracemalloc.get_traced_memory()
+            if peaks:  # keep peak of the enclosing phase so far, `reset_peak` drops it
+                peaks[-1] = max(peaks[-1], peak)
+            peaks.append(0)
+            tracemalloc.reset_peak()
+        self._start = time.perf_counter()
+
+    def __exit__(self, *exc):
+        seconds = time.perf_counter() - self._start
+        peak = 0
+        if self._profiler.memory:
+            peaks = self._profiler._peaks
+            peak = max(tracemalloc.get_traced_memory()[1], peaks.pop())
+            if peaks:
+                peaks[-1] = max(peaks[-1], peak)
+            peak -= self._base
+        self._profiler.record(self._name, seconds, peak)
+
+
+class _NoPhase(object):
+    def __enter__(self):
+        pass
+
+    def __exit__(self, *exc):
+        pass
+
+_NO_PHASE = _NoPhase()
+
+
+def enabled():
+    "Returns whether a profiler is active."
+    return _active is not None
+
+
+def phase(name:str):
+    "Returns context manager measuring phase `name` for the active profiler (no-op without one)."
+    if _active is None:
+        return _NO_PHASE
+    return _Phase(_active, name)
+
+
+def count(name:str, value=1):
+    "Adds `value` to counter `name` of the active profiler (no-op without one)."
+    if _active is not None:
+        _active.add(name, value)
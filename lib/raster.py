@@ -0,0 +1,168 @@
+"""Raster export of mazes colored by components.
+
+Every maze character is drawn once into a square glyph of `scale x scale` pixels (see `glyph`).
+Image rows are then joined from precolored glyph rows, looked up by `character * colors + color` of
+every cell, and written one band of cell rows at a time, so the whole image never sits in memory.
+"""
+import logging
+import math
+import struct
+import zlib
+
+from lib.color import XTERM256
+import lib.cells as cells
+import lib.profiling as profiling
+
+DEFAULT_SCALE = 8
+DEFAULT_BACKGROUND = (0, 0, 0)
+
+_PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+_PNG_IDAT_SIZE = 1 << 16  # compressed bytes per IDAT chunk
+
+
+# Shapes of known characters, `shape(u, v, t)` tells if point `(u, v)` (column, row in 0..1) is inked
+# for half stroke width `t`.
+def _slash(u, v, t): return abs(u + v - 1) <= t * math.sqrt(2)
+def _backslash(u, v, t): return abs(u - v) <= t * math.sqrt(2)
+def _horizontal(u, v, t): return abs(v - 0.5) <= t
+def _vertical(u, v, t): return abs(u - 0.5) <= t
+def _cross(u, v, t): return _horizontal(u, v, t) or _vertical(u, v, t)
+def _diagonal_cross(u, v, t): return _slash(u, v, t) or _backslash(u, v, t)
+def _disk(u, v, t): return (u - 0.5) ** 2 + (v - 0.5) ** 2 <= 0.16
+def _ring(u, v, t): return abs(math.hypot(u - 0.5, v - 0.5) - 0.4) <= t
+def _full(u, v, t): return True
+def _empty(u, v, t): return False
+
+SHAPES = {
+    '╱': _slash, '/': _slash,
+    '╲': _backslash, '\\': _backslash,
+    '╳': _diagonal_cross, 'x': _diagonal_cross, 'X': _diagonal_cross,
+    '─': _horizontal, '-': _horizontal,
+    '│': _vertical, '|': _vertical,
+    '┼': _cross, '+': _cross,
+    '●': _disk, '•': _disk,
+    '○': _ring, 'o': _ring, 'O': _ring,
+    '█': _full, '#': _full,
+    ' ': _empty,
+}
+
+
+def glyph(char, scale:int=DEFAULT_SCALE):
+    """Returns row-major `bytes` of `scale x scale` pixels of `char`, 1 for ink and 0 for background.
+    Characters without a shape in `SHAPES` are drawn as full squares."""
+    shape = SHAPES.get(char)
+    if shape is None:
+        logging.warning('No raster shape of %r, drawn as full square.', char)
+        shape = _full
+    t = max(1, scale / 8) / 2 / scale
+    return bytes(
+        shape((x + 0.5) / scale, (y + 0.5) / scale, t)
+        for y in range(scale) for x in range(scale)
+    )
+
+
+def rgb(color):
+    "Returns `(r, g, b)` of 256-color code or `(r, g, b)` tuple."
+    return XTERM256[color] if type(color) is int else tuple(color)
+
+
+class PPMWriter(object):
+    "Writes binary PPM (P6) image row by row. Pixel `n` is `(r, g, b)` of `palette[n]`."
+
+    def __init__(self, file, width:int, height:int, palette):
+        self._file = file
+        self.pixels = tuple(bytes(rgb) for rgb in palette)
+        file.write(b'P6\n%d %d\n255\n' % (width, height))
+
+    def write(self, rows):
+        "Writes `rows`, iterable of `bytes` of pixels."
+        self._file.writelines(rows)
+
+    def close(self):
+        pass
+
+
+class PNGWriter(object):
+    """Writes 8-bit indexed PNG image row by row. Pixel `n` is index of `palette[n]`.
+
+    Rows are compressed with one `zlib` stream, split into IDAT chunks as compressed data piles up.
+    """
+
+    def __init__(self, file, width:int, height:int, palette):
+        assert len(palette) <= 256, 'PNG palette of {} colors does not fit byte indices'.format(len(palette))
+        self._file = file
+        self.pixels = tuple(bytes((n,)) for n in range(len(palette)))
+        self._compressor = zlib.compressobj(6)
+        self._pending = []
+        self._npending = 0
+        file.write(_PNG_SIGNATURE)
+        self._chunk(b'IHDR', struct.pack('>IIBBBBB', width, height, 8, 3, 0, 0, 0))
+        self._chunk(b'PLTE', b''.join(bytes(rgb) for rgb in palette))
+
+    def _chunk(self, kind, data):
+        self._file.write(struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data)))
+
+    def write(self, rows):
+        "Writes `rows`, iterable of `bytes` of pixels."
+        data = self._compressor.compress(b''.join(b'\x00' + row for row in rows))  # filter type 0 (none) for each row
+        self._pending.append(data)
+        self._npending += len(data)
+        if self._npending >= _PNG_IDAT_SIZE:
+            self._flush()
+
+    def _flush(self):
+        if self._npending:
+            self._chunk(b'IDAT', b''.join(self._pending))
+        self._pending = []
+        self._npending = 0
+
+    def close(self):
+        self._pending.append(self._compressor.flush())
+        self._npending += len(self._pending[-1])
+        self._flush()
+        self._chunk(b'IEND', b'')
+
+
+WRITERS = {'.png': PNGWriter, '.ppm': PPMWriter}
+
+
+def bands(maze, pixels, scale:int=DEFAULT_SCALE):
+    """Yields pixel rows of `maze` colored by components, `scale` rows per cell row.
+
+    `pixels[0]` is background pixel (`bytes`), component of label `l` is drawn with `pixels[l % (len(pixels) - 1) + 1]`.
+    """
+    w, h = maze.size
+    chars = maze._pattern.chars()
+    n = len(pixels) - 1
+    glyphs = [glyph(char, scale) for char in chars]
+    # tiles[y][code * n + c] is row `y` of glyph of `chars[code]` in color `c`
+    tiles = [
+        [
+            b''.join(pixels[(c + 1) * ink] for ink in g[y*scale:(y+1)*scale])
+            for g in glyphs for c in range(n)
+        ]
+        for y in range(scale)
+    ]
+    packed, labels = maze.cells_view(), maze.labels_view()
+    bits = cells.bits(len(chars))
+    for i in range(h):
+        codes = cells.unpack(packed, w, i, i + 1, bits)
+        keys = [code * n + label % n for code, label in zip(codes, labels[i*w:(i+1)*w])]
+        for row in tiles:
+            yield b''.join(map(row.__getitem__, keys))
+
+
+def export(maze, path, colors, scale:int=DEFAULT_SCALE, background=DEFAULT_BACKGROUND):
+    """Writes image of `maze` colored by components to `path`, PNG or PPM by its extension.
+    `colors` are 256-color codes or `(r, g, b)` tuples, component of label `l` gets `colors[l % len(colors)]`."""
+    extension = path[path.rfind('.'):].lower()
+    assert extension in WRITERS, 'Unknown image format {!r}, use one of {}'.format(extension, ', '.join(WRITERS))
+    w, h = maze.size
+    palette = [tuple(background)] + [rgb(color) for color in colors]
+    maze.analyze(('components',))
+    with profiling.phase('export'), open(path, 'wb') as f:
+        writer = WRITERS[extension](f, w * scale, h * scale, palette)
+        rows = bands(maze, writer.pixels, scale)
+        for _ in range(h):
+            writer.write([next(rows) for _ in range(scale)])
+        writer.close()
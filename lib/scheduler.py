@@ -0,0 +1,56 @@
+from collections import namedtuple
+import logging
+import time
+
+FrameStats = namedtuple('FrameStats', ['frames', 'skipped', 'elapsed', 'fps'])
+
+
+class FrameScheduler(object):
+    """Plays animation at fixed frame rate.
+
+    Animation is an iterable of steps: it draws, then yields pause (in seconds) until its next update.
+    Every frame runs all updates due before the end of the frame and calls `present` once.
+    When drawing falls behind the clock, late frames are skipped and their updates go to the next frame,
+    so animation keeps its duration. With `realtime=False` frames are played without waiting.
+    """
+
+    def __init__(self, fps=60, present=None, realtime=True):
+        assert fps > 0, 'Non-positive frame rate'
+        self.fps = fps
+        self.time = 0.0  # scene time of the last update
+        self._present = present
+        self._realtime = realtime
+
+    def run(self, steps):
+        "Plays `steps`, returns `FrameStats`."
+        steps = iter(steps)
+        next_update = 0.0
+        frame, frames, skipped = 0, 0, 0
+        start = time.monotonic()
+        done = False
+        while not done:
+            frame_end = (frame + 1) / self.fps
+            while next_update < frame_end:
+                self.time = next_update
+                try:
+                    next_update += next(steps)
+                except StopIteration:
+                    done = True
+                    break
+            if self._present is not None:
+                self._present()
+            frames += 1
+            frame += 1
+
+            if self._realtime:
+                now = time.monotonic() - start
+                if now < frame_end:
+                    time.sleep(frame_end - now)
+                elif int(now * self.fps) > frame:
+                    skipped += int(now * self.fps) - frame
+                    frame = int(now * self.fps)
+
+        elapsed = time.monotonic() - start
+        stats = FrameStats(frames, skipped, elapsed, frames / elapsed if elapsed else 0.0)
+        logging.info('%d frames (%d skipped) in %.2f s, %.1f fps', *stats)
+        return stats
@@ -1,14 +1,27 @@
-import sys
 from lib.utils import Size
+from lib.sinks import StdoutSink
+import lib.profiling as profiling
+
+RESET = '\u001b[0m'
 
 
 class Screen(object):
     pos:list = None  # i, j position of cursor
     size:Size = None
 
-    def __init__(self, width:int, height:int):
+    def __init__(self, width:int, height:int, buffered:bool=False, sink=None):
+        """Creates `Screen` of `width x height` characters below the current terminal line.
+
+        If `buffered`, drawing calls only update an in-memory frame, and `present` sends
+        the cells changed since the previous frame to the terminal in a single write.
+        Output goes to `sink` (see `lib.sinks`), standard output by default.
+        """
+        self.sink = sink if sink is not None else StdoutSink()
         self._set_size(width, height)
+        self._buffered = buffered
         self._init_screen()
+        if buffered:
+            self._init_frame()
 
     def _set_size(self, width, height):
         assert width > 0, 'Negative screen width'
@@ -17,9 +30,21 @@ class Screen(object):
 
     def _init_screen(self):
         w, h = self.size.width, self.size.height
-        sys.stdout.write(((' ' * w) + '\n')* h)
+        self._write(((' ' * w) + '\n')* h)
         self.pos = [h, 0]
-        self._cursor_move_up(h)
+        self._write(self._moves(self.pos, 0, 0))
+
+    def _init_frame(self):
+        n = self.size.width * self.size.height
+        self._chars, self._pens = [' '] * n, [''] * n               # frame being drawn
+        self._shown_chars, self._shown_pens = [' '] * n, [''] * n   # frame on the terminal
+        self._dirty = set()
+        self._pen = ''              # markup of the drawn chars
+        self._shown_pen = ''        # markup the terminal is in
+        self._cursor = list(self.pos)  # cursor of the terminal
+
+    def _write(self, s):
+        self.sink.write(s)
 
     def write_char(self, char:str, at=None):
         "Writes single char at position `at`. If `at` is `None`, writes at current cursors' position."
@@ -27,53 +52,95 @@ class Screen(object):
         assert len(char) == 1, '`char` string must be len of 1'
         if at is not None:
             self._cursor_move_to(*at)
-        sys.stdout.write(char)
+        if self._buffered:
+            i, j = self.pos
+            if j < self.size.width:
+                idx = i * self.size.width + j
+                self._chars[idx], self._pens[idx] = char, self._pen
+                self._dirty.add(idx)
+        else:
+            self._write(char)
         self._incr_j_pos()
 
     def write_ansi_markup(self, ansi, at=None):
         """Writes `ansi` escape codes (or sequence of codes).
         (!) Use it only for writing markup codes.
         Any cursor-moving ansi-es would cause inappropiate output.
+        In buffered mode markup replaces the previous one, `RESET` clears it.
         """
         if at is not None:
             self._cursor_move_to(*at)
-        sys.stdout.write(ansi)
+        if self._buffered:
+            self._pen = '' if ansi == RESET else ansi
+        else:
+            self._write(ansi)
+
+    def present(self):
+        """Sends cells changed since the previous `present` to the terminal with one write.
+        Cursor is moved only between non-adjacent cells, markup is written only when it changes."""
+        assert self._buffered, '`present` needs buffered `Screen`'
+        with profiling.phase('screen.present'):
+            self._present()
+        with profiling.phase('screen.flush'):
+            self.sink.flush()
+        self.sink.end_frame()
+        if profiling.enabled():
+            frame = self.sink.frames[-1]
+            profiling.count('screen.frames')
+            profiling.count('screen.writes', frame.writes)
+            profiling.count('screen.bytes', frame.bytes)
+
+    def _present(self):
+        w = self.size.width
+        out = []
+        cursor = self._cursor
+        for idx in sorted(self._dirty):
+            char, pen = self._chars[idx], self._pens[idx]
+            if char == self._shown_chars[idx] and pen == self._shown_pens[idx]:
+                continue
+            i, j = divmod(idx, w)
+            if j == 0 and cursor[1] != 0:
+                out.append('\r')
+                cursor[1] = 0
+            out.append(self._moves(cursor, i, j))
+            if pen != self._shown_pen:
+                out.append(pen or RESET)
+                self._shown_pen = pen
+            out.append(char)
+            if j + 1 < w:
+                cursor[1] = j + 1
+            else:  # cursor stays at the last column waiting to wrap
+                out.append('\r')
+                cursor[1] = 0
+            self._shown_chars[idx], self._shown_pens[idx] = char, pen
+        self._dirty.clear()
+        if out:
+            self._write(''.join(out))
 
     def _incr_j_pos(self, step=1):
         self.pos[1] += step
 
-    def _cursor_move_up(self, step):
-        ci = self.pos[0]
-        self.pos[0] = max(0, ci - step)
-        sys.stdout.write('\u001b[{}A'.format(ci - self.pos[0]))
-
-    def _cursor_move_down(self, step):
-        ci = self.pos[0]
-        self.pos[0] = min(self.size.height-1, ci + step)
-        sys.stdout.write('\u001b[{}B'.format(self.pos[0] - ci))
-    
-    def _cursor_move_left(self, step):
-        cj = self.pos[1]
-        self.pos[1] = max(0, cj - step)
-        sys.stdout.write('\u001b[{}D'.format(cj - self.pos[1]))
-
-    def _cursor_move_right(self, step):
-        cj = self.pos[1]
-        self.pos[1] = min(self.size.width-1, cj + step)
-        sys.stdout.write('\u001b[{}C'.format(self.pos[1] - cj))
+    def _moves(self, pos, i, j):
+        """Returns escape sequence moving cursor from `pos` towards (i, j), bounded by `size` of `Screen`.
+        Updates `pos` in place."""
+        ci, cj = pos
+        pos[0] = min(max(0, i), self.size.height - 1)
+        pos[1] = min(max(0, j), self.size.width - 1)
+        seq = ''
+        if pos[0] > ci:
+            seq += '\u001b[{}B'.format(pos[0] - ci)
+        elif pos[0] < ci:
+            seq += '\u001b[{}A'.format(ci - pos[0])
+        if pos[1] > cj:
+            seq += '\u001b[{}C'.format(pos[1] - cj)
+        elif pos[1] < cj:
+            seq += '\u001b[{}D'.format(cj - pos[1])
+        return seq
 
     def _cursor_move_to(self, i, j):
-        ci, cj = self.pos
-
-        if i > ci:
-            self._cursor_move_down(i - ci)
-        elif i < ci:
-            self._cursor_move_up(ci - i)
-
-        if j > cj:
-            self._cursor_move_right(j - cj)
-        elif j < cj:
-            self._cursor_move_left(cj - j)
+        seq = self._moves(self.pos, i, j)
+        if not self._buffered:
+            self._write(seq)
 
     def cursor_move(self, i, j):
         "Moves cursor to `i`, `j` 0-based position. The moving is bounded by `size` of `Screen`."
@@ -82,8 +149,19 @@ class Screen(object):
     def cursor_move_outside(self):
         """Moves cursor just after the `Screen` (start of line with y = `Screen.size.height`.
         Useful for ending."""
-        self._cursor_move_to(self.size.height, 0)
-        sys.stdout.write('\u001b[{}B'.format(1))
+        if self._buffered:
+            self.present()
+            self._cursor[1] = 0
+            tail = '\r' + self._moves(self._cursor, self.size.height, 0)
+            if self._shown_pen:
+                tail += RESET
+                self._shown_pen = ''
+            self.pos = list(self._cursor)
+            self._write(tail)
+        else:
+            self._cursor_move_to(self.size.height, 0)
+        self._write('\u001b[{}B'.format(1))
+        self.sink.flush()
 
 
 if __name__ == '__main__':
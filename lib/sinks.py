@@ -0,0 +1,100 @@
+import io
+import os
+import re
+import sys
+
+_CURSOR_MOVE = re.compile('\u001b\\[\\d*[ABCD]|\r')
+_SGR = re.compile('\u001b\\[[\\d;]*m')
+
+
+class OutputStats(object):
+    "Counters of terminal output."
+    __slots__ = ('bytes', 'writes', 'cursor_moves', 'sgr')
+
+    def __init__(self):
+        self.bytes = self.writes = self.cursor_moves = self.sgr = 0
+
+    def add(self, s:str):
+        self.bytes += len(s.encode('utf-8'))
+        self.writes += 1
+        self.cursor_moves += len(_CURSOR_MOVE.findall(s))
+        self.sgr += len(_SGR.findall(s))
+
+    def as_dict(self):
+        return {name: getattr(self, name) for name in self.__slots__}
+
+
+class Sink(object):
+    """Destination of `Screen` output, counts what is written to it.
+
+    `stats` holds totals, `frames` holds counters of every finished frame (see `end_frame`).
+    Subclasses implement `_write` and `_flush`.
+    """
+
+    def __init__(self):
+        self.stats = OutputStats()
+        self.frames = []
+        self._frame = OutputStats()
+
+    def write(self, s:str):
+        self.stats.add(s)
+        self._frame.add(s)
+        self._write(s)
+
+    def flush(self):
+        self._flush()
+
+    def end_frame(self):
+        "Closes counters of the current frame."
+        self.frames.append(self._frame)
+        self._frame = OutputStats()
+
+    def _write(self, s):
+        raise NotImplementedError
+
+    def _flush(self):
+        pass
+
+
+class StdoutSink(Sink):
+    "Writes to `sys.stdout`."
+
+    def _write(self, s):
+        sys.stdout.write(s)
+
+    def _flush(self):
+        sys.stdout.flush()
+
+
+class BufferSink(Sink):
+    "Keeps output in memory, see `getvalue`."
+
+    def __init__(self):
+        super().__init__()
+        self._buffer = io.StringIO()
+
+    def _write(self, s):
+        self._buffer.write(s)
+
+    def getvalue(self):
+        return self._buffer.getvalue()
+
+
+class FdSink(Sink):
+    "Writes UTF-8 encoded output to file descriptor `fd`."
+
+    def __init__(self, fd:int):
+        super().__init__()
+        self._fd = fd
+
+    def _write(self, s):
+        data = s.encode('utf-8')
+        while data:
+            data = data[os.write(self._fd, data):]
+
+
+class NullSink(Sink):
+    "Discards output, keeps only counters."
+
+    def _write(self, s):
+        pass
@@ -0,0 +1,82 @@
+from collections import deque
+from itertools import count
+
+from lib.cells import CellSource
+from lib.tenprint import DEFAULT_SEED, DEFAULT_PATTERN, DEFAULT_RNG
+
+
+def stream_rows(width:int, seed=DEFAULT_SEED, pattern=DEFAULT_PATTERN, rng=DEFAULT_RNG, height=None):
+    """Yields rows `(chars, labels)` of a maze of `width`, one by one. `height=None` means endless maze.
+
+    Cells are the same as of `Maze` with the same `seed` and `rng`. Only `2 * radius + 1` rows of cells
+    (three for 3x3 patterns) and masks and labels of the last `radius` emitted rows are kept.
+    Label of a component is the one it got when first seen; when components merge, the older label
+    survives for the rows to come, already emitted rows keep their labels. Labels are not required to be contiguous.
+    """
+    compiled = pattern.compile()
+    r = compiled.radius
+    table = dict(enumerate(map(ord, pattern.chars())))
+    source = CellSource(seed, rng, width, compiled.k)
+    rows = range(height) if height is not None else count()
+    new_label = count()
+
+    behind, ahead = deque(maxlen=r), deque()
+    window = deque(maxlen=r)  # (masks, labels) of emitted rows
+    for i in rows:
+        while len(ahead) < r + 1 and (height is None or i + len(ahead) < height):
+            ahead.append(source.take(width))
+        row = ahead[0]
+        above = b''.join(behind) or None
+        below = b''.join(list(ahead)[1:]) or None
+        masks = compiled.masks(row, width, 1, above, below)
+
+        labels = _label_row(compiled, width, masks, window, new_label)
+        yield bytes(row).decode('latin-1').translate(table), labels
+
+        behind.append(bytes(ahead.popleft()))
+        window.append((masks, labels))
+
+
+def _label_row(compiled, width, masks, window, new_label):
+    """Returns labels of the row with neighbour `masks` given `(masks, labels)` of the previous rows.
+
+    Union-find runs over cells of the previous rows and the current row (the last `width` nodes).
+    Cells of equal labels are already connected; edges between rows of the window are added again,
+    as components of earlier rows may have merged through later ones.
+    """
+    rows = list(window) + [(masks, None)]
+    last = len(rows) - 1
+    parent = list(range(len(rows) * width))
+
+    def find(a):
+        while parent[a] != a:
+            parent[a] = a = parent[parent[a]]
+        return a
+
+    def union(a, b):
+        a, b = find(a), find(b)
+        if a != b:
+            parent[max(a, b)] = min(a, b)
+
+    first = {}
+    for t, (_, labels) in enumerate(rows[:-1]):
+        for j, l in enumerate(labels):
+            union(first.setdefault(l, t * width + j), t * width + j)
+    for t, (row_masks, _) in enumerate(rows):
+        for j, m in enumerate(row_masks):
+            for di, dj in compiled.moves[m]:
+                if 0 <= t + di <= last:
+                    union(t * width + j, (t + di) * width + j + dj)
+
+    inherited = {}
+    for t, (_, labels) in enumerate(rows[:-1]):
+        for j, l in enumerate(labels):
+            root = find(t * width + j)
+            inherited[root] = min(inherited.get(root, l), l)
+    labels = []
+    for j in range(width):
+        root = find(last * width + j)
+        if root not in inherited:
+            inherited[root] = next(new_label)
+        labels.append(inherited[root])
+    return labels
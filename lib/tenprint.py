@@ -1,105 +1,135 @@
-import random
-from collections import deque
+from array import array
+
 from lib.utils import Size
 from lib.mazepattern import MazePattern
+from lib.cells import CharRows
+import lib.cells as cells
+import lib.labeling as labeling
+import lib.profiling as profiling
 
 import lib.config as config
 
 DEFAULT_SEED = config.DEFAULT_MAZE_SEED
 DEFAULT_SIZE = config.DEFAULT_MAZE_SIZE
+DEFAULT_RNG = config.DEFAULT_MAZE_RNG
 DEFAULT_PATTERN = MazePattern()
 
+STAGES = ('neighbours', 'components')
+
 
 class Maze(object):
-    size:Size = None
-    maze = None
-    _components = None
-    _vertex_belong = None
-    _neighbours = None
+    """10PRINT maze with its connectivity components.
+
+    State lives in flat buffers: `_cells` packed one bit per cell for two characters (see `lib.cells.pack`),
+    `_masks` with neighbour bitmask of every cell, one byte for 3x3 patterns (see `CompiledPattern`)
+    and `_labels` with component index of every cell (row-major).
+    Analysis buffers are `None` until their stage is run, see `analyze`.
+    """
+    __slots__ = ('size', 'maze', '_pattern', '_compiled', '_cells', '_masks', '_labels', '_ncomponents', '_stats',
+        '_free')
+
+    size:Size
 
-    def __init__(self, size=DEFAULT_SIZE, seed=DEFAULT_SEED, pattern=DEFAULT_PATTERN):
-        "Creates `Maze` object from `size = (width, height)`, `seed` for `random.seed`, and pair of `chars`."
+    def __init__(self, size=DEFAULT_SIZE, seed=DEFAULT_SEED, pattern=DEFAULT_PATTERN, rng=DEFAULT_RNG, lazy=False,
+            origin=(0, 0)):
+        """Creates `Maze` object from `size = (width, height)`, `seed`, `pattern` and `rng` mode.
+        See `lib.cells` for available `rng` modes. With `rng='v3'` the maze is a window
+        at `origin = (row, column)` of the unbounded maze of `seed`.
+        If `lazy`, analysis stages run on first access to their results instead of here."""
 
         self.size = Size(width=size[0], height=size[1])
-        self.maze = Maze.generate(size, seed, pattern)
         self._pattern = pattern
-        
-        self._calc_neighbours()     # self._neighbours
-        self._calc_components()     # self._components
-        self._calc_vertex_belong()  # self._vertex_belong
+        self._compiled = pattern.compile()
+
+        with profiling.phase('maze.generate'):
+            unpacked = cells.generate(size[0], size[1], seed, rng, origin, self._compiled.k)
+            self._cells = cells.pack(unpacked, size[0], self._bits())
+        self.maze = CharRows(self._cells, size[0], pattern.chars(), size[1])
+        self._masks = self._labels = self._ncomponents = self._stats = self._free = None
+
+        if not lazy:
+            self._calc_neighbours(unpacked)  # self._masks
+            self._calc_components()          # self._labels
 
     @classmethod
-    def generate(cls, size=DEFAULT_SIZE, seed=DEFAULT_SEED, pattern=DEFAULT_PATTERN):
-        "Returns matrix of `size[0] x size[1]` with `chars`. Sets globally `seed`."
-        random.seed(seed)
-        chars = pattern.chars()
-        maze = tuple( tuple( chars[int(0.5 + random.random())] for _ in range(size[0]) ) for _ in range(size[1]))
+    def from_buffers(cls, size, pattern, cells, masks=None, labels=None, ncomponents=None, stats=None):
+        """Creates `Maze` from packed `cells`, neighbour `masks`, component `labels` and their `stats` computed elsewhere.
+        Missing analysis buffers are computed on demand."""
+        maze = cls.__new__(cls)
+        maze.size = Size(width=size[0], height=size[1])
+        maze._pattern = pattern
+        maze._compiled = pattern.compile()
+        maze._cells = cells
+        maze.maze = CharRows(cells, size[0], pattern.chars(), size[1])
+        maze._masks = masks
+        maze._labels = labels
+        maze._ncomponents = ncomponents
+        maze._stats = stats
+        maze._free = None
         return maze
 
-    def _calc_neighbours(self):
-        """
-        self._neighbours:
-        Calculates list of neighbours (i^, j^) vertex `v = (i, j)` for maze of chars '╱╲'.
-        """
-        
-        self._neighbours = self.fill_matrix()
-        
-        maze = self.maze
-        w, h = self.size.width, self.size.height
-
-        # ghost_maze is the same maze with additional empty-char boundaries on each side
-        ghost_maze = []
-        fill = self._pattern.fill()
-        ghost_maze.append([fill] * (self.size.width + 2))  # top
-        for i in range(h):
-            ghost_maze.append(
-                [fill] + list(self.maze[i][:]) + [fill]    # inner
-            )
-        ghost_maze.append([fill] * (self.size.width + 2))  # bottom
-
-        # cycle goes over positions in original maze
-        for i in range(h):
-            for j in range(w):
-                # i_ghost = i + 1, j_ghost = j + 1
-                # need to create window from (i-1, j-1) up to (i+1, j+1)
-                window = [
-                    ghost_maze[i][j:j+3],    # row above: [i-1] -> [i-1+1] = [i]
-                    ghost_maze[i+1][j:j+3],  # [j-1:j+2] -> [j-1+1:j+2+1] = [j:j+3]
-                    ghost_maze[i+2][j:j+3]
-                ]
-                adj = self._pattern.adjacent(window, is_matrix=True)
-                neigh = set()
-                for di, dj in adj:
-                    ii, jj = i + di, j + dj
-                    if 0 <= ii < h and 0 <= jj < w:
-                        neigh.add((ii, jj))
-                self._neighbours[i][j] = frozenset(neigh)
+    @classmethod
+    def generate(cls, size=DEFAULT_SIZE, seed=DEFAULT_SEED, pattern=DEFAULT_PATTERN, rng=DEFAULT_RNG, origin=(0, 0)):
+        """Returns matrix of `size[0] x size[1]` with `chars`.
+        Characters are materialized row by row on access."""
+        k = len(pattern.chars())
+        packed = cells.pack(cells.generate(size[0], size[1], seed, rng, origin, k), size[0], cells.bits(k))
+        return CharRows(packed, size[0], pattern.chars(), size[1])
+
+    def _bits(self):
+        "Returns bits per packed cell."
+        return cells.bits(self._compiled.k)
+
+    def analyze(self, stages=STAGES):
+        "Runs analysis `stages` (see `STAGES`) and the stages they depend on, unless done already. Returns `self`."
+        for stage in stages:
+            assert stage in STAGES, 'Unknown analysis stage {!r}'.format(stage)
+        if self._masks is None and stages:
+            self._calc_neighbours()  # self._masks
+        if self._labels is None and 'components' in stages:
+            self._calc_components()  # self._labels
+        if self._free is not None and 'components' in stages:
+            self._renumber()
+        return self
+
+    def _calc_neighbours(self, unpacked=None):
+        "Calculates neighbour bitmask of every cell of `unpacked` cells (unpacks `self._cells` if not given)."
+        with profiling.phase('maze.neighbours'):
+            if unpacked is None:
+                unpacked = cells.unpack(self._cells, self.size.width, bits=self._bits())
+            self._masks = self._compiled.masks(unpacked, self.size.width, self.size.height)
 
     def neighbours(self, v):
         "Returns `set` of neighbours of vertex `v = (i, j).`"
-        return self._neighbours[v[0]][v[1]]
-
-    def _component(self, start, visited=None):
-        "Returns connectivity component (set) which vertex `start` belongs to."
-
-        # wave algorithm
-        q = deque([start])
-        maze = self.maze
-        visited = self.fill_matrix(False) if visited is None else visited
-        component = set()
-        component.add(start)
-        while q:
-            u = q.pop()
-            for i, j in self.neighbours(u):
-                if not visited[i][j]:
-                    visited[i][j] = True
-                    q.appendleft((i, j))
-                    component.add((i, j))
-        return component
+        if self._masks is None:
+            self.analyze(('neighbours',))
+        i, j = v
+        mask = self._masks[i * self.size.width + j]
+        return frozenset((i + di, j + dj) for di, dj in self._compiled.moves[mask])
 
     def components(self):
-        "Returns connectivity components."
-        return [set(comp) for comp in self._components]
+        "Returns connectivity components as `set`s of cells, see `labels_view` for reading labels without copies."
+        self.analyze(('components',))
+        components = [set() for _ in range(self._ncomponents)]
+        w = self.size.width
+        for v, c in enumerate(self._labels):
+            components[c].add(divmod(v, w))
+        return components
+
+    def stats(self):
+        """Returns `lib.labeling.ComponentStats` of connectivity components.
+        After `flip` labels may have gaps until components are numbered again by `analyze`."""
+        if self._labels is None:
+            self.analyze(('components',))
+        if self._stats is None:
+            self._stats = labeling.ComponentStats.from_labels(self._labels, self._ncomponents, *self.size)
+        return self._stats
+
+    def waves(self):
+        """Returns cells of components in breadth-first order, see `lib.labeling.waves`.
+        Cells are flat indices `i * width + j`."""
+        self.analyze()
+        return labeling.waves(self._masks, self._labels, self._ncomponents, self.size.width, self._compiled.offsets)
 
     def fill_matrix(self, val=None, size=None):
         """
@@ -112,22 +142,355 @@ class Maze(object):
         return [[val] * w for _ in range(h)]
 
     def _calc_components(self):
-        "Calculates connectivity components of `self.maze`."
-        self._components = []
-        visited = self.fill_matrix(False)
-        for i in range(self.size.height):
-            for j in range(self.size.width):
-                if not visited[i][j]:
-                    component = self._component((i, j), visited)
-                    self._components.append(component)
-
-    def _calc_vertex_belong(self):
-        "Returns matrix Aij = c, where c is index of `self._components` list which ij-vertex belongs to."
-        self._vertex_belong = self.fill_matrix(0)
-        for (i, comp) in enumerate(self._components):
-            for ii, jj in comp:
-                self._vertex_belong[ii][jj] = i
+        "Calculates connectivity components of `self.maze` as `self._labels`."
+        with profiling.phase('maze.components'):
+            self._labels, self._ncomponents, self._stats = labeling.label(
+                self._masks, self.size.width, self.size.height, self._compiled.offsets, self._compiled.symmetric, stats=True
+            )
+
+    def labels(self):
+        "Returns row-major `array` of component index of every cell."
+        self.analyze(('components',))
+        return self._labels
+
+    def cells_view(self):
+        """Returns read-only `memoryview` of packed cells (see `lib.cells.pack`), `lib.cells.stride` bytes per row.
+
+        The `*_view` methods share memory with the maze instead of copying it. Views are flat, row `i` of
+        labels is `view[i*width:(i+1)*width]` (a view as well), `numpy.asarray(view).reshape(height, -1)`
+        is a matrix without copy. Changes of cells show through views; buffers replaced by `flip`
+        (of a maze loaded from file) or renumbering of labels are not, take new views after changes.
+        """
+        return memoryview(self._cells).toreadonly()
+
+    def masks_view(self):
+        "Returns read-only `memoryview` of neighbour bitmask of every cell (row-major), see `cells_view`."
+        self.analyze(('neighbours',))
+        return memoryview(self._masks).toreadonly()
+
+    def labels_view(self):
+        "Returns read-only `memoryview` of component label of every cell (row-major), see `cells_view`."
+        self.analyze(('components',))
+        return memoryview(self._labels).toreadonly()
 
     def vertex_belong(self):
-        "Returns matrix which ij-element equals index of connectivity component which (i, j)-vertex belongs to."
-        return [list(row) for row in self._vertex_belong]  # copy
+        """Returns matrix which ij-element equals index of connectivity component which (i, j)-vertex belongs to.
+        The matrix is a copy, see `labels_view` for reading labels without one."""
+        self.analyze(('components',))
+        w = self.size.width
+        return [self._labels[i*w:(i+1)*w].tolist() for i in range(self.size.height)]
+
+    def nbytes(self):
+        "Returns size of cell, neighbour and label buffers in bytes."
+        n = len(self._cells)
+        if self._masks is not None:
+            n += len(self._masks) * getattr(self._masks, 'itemsize', 1)
+        if self._labels is not None:
+            n += len(self._labels) * self._labels.itemsize
+        if self._stats is not None:
+            n += len(self._stats) * (self._stats.sizes.itemsize + 4 * self._stats.top.itemsize)
+        return n
+
+    def copy(self):
+        "Returns independent copy of the maze, e.g. to `flip` cells of a cached one."
+        if self._free is not None:
+            self._renumber()
+        return Maze.from_buffers(
+            self.size, self._pattern, bytearray(self._cells), _copied(self._masks),
+            None if self._labels is None else array(_typecode(self._labels), self._labels),
+            self._ncomponents,
+            None if self._stats is None else self._stats.remapped(range(len(self._stats)), len(self._stats)),
+        )
+
+    def flip(self, i:int, j:int):
+        "Changes cell `(i, j)` to the next maze character (swaps two characters), see `set`."
+        w = self.size.width
+        self._change(i, j, (cells.get(self._cells, w, i, j, self._bits()) + 1) % self._compiled.k)
+
+    def set(self, i:int, j:int, char):
+        """Sets cell `(i, j)` to maze character `char` and updates analysis done so far.
+
+        Only neighbour masks of the block of pattern size around the cell change. Components joined by new edges
+        are merged by relabeling the smaller ones; when edges are removed, components around them
+        are relabeled by search from their ends. Either way the work is bounded by the affected
+        components, not the grid. New components take labels freed by old ones, so labels are
+        no longer numbered by first cell until the next `analyze` of components renumbers them.
+        """
+        assert char in self._pattern.chars(), '{!r} is not a maze character'.format(char)
+        self._change(i, j, self._pattern.chars().index(char))
+
+    def _change(self, i, j, code):
+        w, h = self.size
+        assert 0 <= i < h and 0 <= j < w, 'Cell {} is outside of the maze'.format((i, j))
+        if cells.get(self._cells, w, i, j, self._bits()) == code:
+            return
+        self._writable()
+        cells.put(self._cells, w, i, j, code, self._bits())
+        self.maze.invalidate(i)
+        if self._masks is None:
+            return
+
+        r = self._compiled.radius
+        block = [a * w + b for a in range(max(i - r, 0), min(i + r + 1, h)) for b in range(max(j - r, 0), min(j + r + 1, w))]
+        if self._labels is None:
+            self._update_masks(block)
+            return
+        self.stats()
+        old = {u: self._adjacent(u) for u in block}
+        self._update_masks(block)
+        new = {u: self._adjacent(u) for u in block}
+
+        # removed edges split components first, then added ones merge them
+        kept = {u: old[u] & new[u] for u in block}
+        removed = [(u, v) for u in block for v in old[u] - new[u]]
+        added = [(u, v) for u in block for v in new[u] - old[u]]
+        if removed:
+            self._split(removed, kept)
+        if added:
+            self._merge(added)
+
+    def _writable(self):
+        "Replaces read-only buffers (of a memory-mapped file) with copies."
+        if not isinstance(self._cells, bytearray):
+            self._cells = bytearray(self._cells)
+            self.maze = CharRows(self._cells, self.size.width, self._pattern.chars(), self.size.height)
+        if isinstance(self._masks, memoryview):
+            self._masks = _copied(self._masks)
+        if isinstance(self._labels, memoryview):
+            self._labels = array(_typecode(self._labels), self._labels)
+
+    def _code(self, i, j):
+        "Returns cell index at `(i, j)`, `FILL` of the compiled pattern outside of the maze."
+        w, h = self.size
+        if 0 <= i < h and 0 <= j < w:
+            return cells.get(self._cells, w, i, j, self._bits())
+        return self._compiled.FILL
+
+    def _update_masks(self, block):
+        w = self.size.width
+        around = range(-self._compiled.radius, self._compiled.radius + 1)
+        for u in block:
+            i, j = divmod(u, w)
+            self._masks[u] = self._compiled.mask([self._code(i + di, j + dj) for di in around for dj in around])
+
+    def _adjacent(self, u):
+        "Returns `set` of cells connected to cell `u` in either direction."
+        w, h = self.size
+        compiled = self._compiled
+        adjacent = {u + di * w + dj for di, dj in compiled.moves[self._masks[u]]}
+        if not compiled.symmetric:
+            i, j = divmod(u, w)
+            for k, (di, dj) in enumerate(compiled.offsets):
+                a, b = i + di, j + dj
+                if 0 <= a < h and 0 <= b < w and (-di, -dj) in compiled.moves[self._masks[a * w + b]]:
+                    adjacent.add(a * w + b)
+        return adjacent
+
+    def _search(self, start, within=None):
+        "Returns cells of the component of `start` and their bounding box, only cells labeled `within` if given."
+        w = self.size.width
+        labels = self._labels
+        seen = {start}
+        stack = [start]
+        top, left, bottom, right = start // w, start % w, start // w, start % w
+        while stack:
+            u = stack.pop()
+            i, j = divmod(u, w)
+            top, bottom = min(top, i), max(bottom, i)
+            left, right = min(left, j), max(right, j)
+            for v in self._adjacent(u):
+                if v not in seen and (within is None or labels[v] == within):
+                    seen.add(v)
+                    stack.append(v)
+        return seen, (top, left, bottom, right)
+
+    def _new_label(self):
+        if self._free:
+            return self._free.pop()
+        c = len(self._stats)
+        if c >= 1 << (8 * self._labels.itemsize):
+            self._labels = array(labeling.typecode(c), self._labels)
+        return c
+
+    def _split(self, removed, kept):
+        """Relabels components which lost `removed` edges, `kept[u]` are remaining neighbours of changed cells.
+
+        Searches from the ends of removed edges run side by side and join when they meet.
+        Finished searches are pieces broken off a component; once only one search is left,
+        it is the rest of the component and keeps its label without being searched to the end
+        (unless its bounding box may have shrunk).
+        """
+        if self._free is None:
+            self._free = []
+        labels, stats = self._labels, self._stats
+
+        def adjacent(u):
+            if u in kept:
+                return kept[u]
+            return {v for v in self._adjacent(u) if v not in kept or u in kept[v]}
+
+        ends = {}
+        for edge in removed:
+            for u in edge:
+                ends.setdefault(labels[u], set()).add(u)
+
+        for c, starts in ends.items():
+            pieces = self._pieces(starts, adjacent)
+            if pieces[-1][1]:
+                rest = pieces.pop()
+                size, box = stats.sizes[c], list(stats[c][1:])
+                for seen, _, piece_box in pieces:
+                    size -= len(seen)
+                    if box is not None and any(x == y for x, y in zip(piece_box, box)):
+                        box = None  # the rest may not reach this side of the box any more
+                if box is None:
+                    self._finish(rest, adjacent)
+                    size, box = len(rest[0]), rest[2]
+            else:
+                rest = max(pieces, key=lambda piece: len(piece[0]))
+                pieces.remove(rest)
+                size, box = len(rest[0]), rest[2]
+            stats.set(c, size, *box)
+
+            for seen, _, piece_box in pieces:
+                new_label = self._new_label()
+                labels = self._labels
+                for u in seen:
+                    labels[u] = new_label
+                stats.set(new_label, len(seen), *piece_box)
+                self._ncomponents += 1
+
+    def _pieces(self, starts, adjacent):
+        """Searches from `starts` side by side until at most one search is unfinished.
+        Returns searches `[seen, stack, box]` with the unfinished one (if any) last."""
+        w = self.size.width
+        owner = {}
+        searches = []
+        for u in starts:
+            if u not in owner:
+                owner[u] = len(searches)
+                searches.append([{u}, [u], [u // w, u % w, u // w, u % w]])
+        alias = list(range(len(searches)))
+
+        def find(a):
+            while alias[a] != a:
+                a = alias[a]
+            return a
+
+        active = list(range(len(searches)))
+        while len(active) > 1:
+            for a in list(active):
+                a = find(a)
+                if a not in active:
+                    continue
+                seen, stack, box = searches[a]
+                if not stack:
+                    active.remove(a)
+                    continue
+                u = stack.pop()
+                i, j = divmod(u, w)
+                box[0], box[1], box[2], box[3] = min(box[0], i), min(box[1], j), max(box[2], i), max(box[3], j)
+                for v in adjacent(u):
+                    b = find(owner[v]) if v in owner else None
+                    if b is None:
+                        owner[v] = a
+                        seen.add(v)
+                        stack.append(v)
+                    elif b != a:  # searches met, the smaller joins the larger
+                        if len(searches[b][0]) > len(seen):
+                            a, b = b, a
+                        big, small = searches[a], searches[b]
+                        big[0] |= small[0]
+                        big[1] += small[1]
+                        big[2] = [min(big[2][0], small[2][0]), min(big[2][1], small[2][1]),
+                                  max(big[2][2], small[2][2]), max(big[2][3], small[2][3])]
+                        alias[b] = a
+                        if b in active:
+                            active.remove(b)
+                        if a not in active:
+                            active.append(a)
+                        searches[b] = None
+                        seen, stack = big[0], big[1]
+        finished = [searches[a] for a in range(len(searches)) if searches[a] is not None and a not in active]
+        return finished + [searches[a] for a in active]
+
+    def _finish(self, search, adjacent):
+        "Runs `search` of `_pieces` to the end."
+        w = self.size.width
+        seen, stack, box = search
+        while stack:
+            u = stack.pop()
+            i, j = divmod(u, w)
+            box[0], box[1], box[2], box[3] = min(box[0], i), min(box[1], j), max(box[2], i), max(box[3], j)
+            for v in adjacent(u):
+                if v not in seen:
+                    seen.add(v)
+                    stack.append(v)
+
+    def _merge(self, added):
+        "Merges components joined by `added` edges, relabeling all but the largest of every group."
+        if self._free is None:
+            self._free = []
+        labels, stats = self._labels, self._stats
+        parent = {}
+
+        def find(a):
+            while parent.get(a, a) != a:
+                a = parent[a]
+            return a
+
+        starts = {}
+        for u, v in added:
+            starts.setdefault(labels[u], u)
+            starts.setdefault(labels[v], v)
+            a, b = find(labels[u]), find(labels[v])
+            if a != b:
+                parent[a] = b
+
+        groups = {}
+        for c in starts:
+            groups.setdefault(find(c), []).append(c)
+        for group in groups.values():
+            keep = max(group, key=stats.sizes.__getitem__)
+            size, top, left, bottom, right = stats[keep]
+            for c in group:
+                if c == keep:
+                    continue
+                component, _ = self._search(starts[c], within=c)
+                for v in component:
+                    labels[v] = keep
+                size += stats.sizes[c]
+                top, left = min(top, stats.top[c]), min(left, stats.left[c])
+                bottom, right = max(bottom, stats.bottom[c]), max(right, stats.right[c])
+                stats.set(c, 0)
+                self._free.append(c)
+                self._ncomponents -= 1
+            stats.set(keep, size, top, left, bottom, right)
+
+    def _renumber(self):
+        "Numbers components by first cell again after `flip`."
+        mapping = [None] * len(self._stats)
+        count = 0
+        for c in self._labels:
+            if mapping[c] is None:
+                mapping[c] = count
+                count += 1
+        self._labels = array(labeling.typecode(count), map(mapping.__getitem__, self._labels))
+        self._stats = self._stats.remapped(mapping, count)
+        self._ncomponents = count
+        self._free = None
+
+
+def _copied(buffer):
+    "Returns writable copy of masks `buffer` (`bytearray` for bytes, `array` otherwise), `None` for `None`."
+    if buffer is None:
+        return None
+    typecode = _typecode(buffer)
+    if typecode == 'B' and not isinstance(buffer, array):
+        return bytearray(buffer)
+    return array(typecode, buffer)
+
+
+def _typecode(buffer):
+    "Returns item typecode of `array`, `memoryview` (of a loaded maze) or bytes `buffer`."
+    return getattr(buffer, 'typecode', None) or getattr(buffer, 'format', 'B')
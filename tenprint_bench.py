@@ -0,0 +1,214 @@
+#!/usr/bin/env python3
+
+from lib.tenprint import Maze
+from lib.mazepattern import PATTERNS
+from lib.color import Palette
+from lib.sinks import NullSink
+
+import tenprint_components
+import tenprint_scene_components_wave
+import tenprint_scene_intro
+
+import argparse
+import json
+import platform
+import sys
+import time
+import tracemalloc
+
+
+DEFAULT_SIZES = '80x28,250x250,1000x1000,2000x2000,4000x4000'
+DEFAULT_SCENE_MAX_CELLS = 250 * 250
+DEFAULT_THRESHOLD = 1.25
+DEFAULT_REPEAT = 5
+DEFAULT_MIN_TIME = 0.01  # seconds, shorter measurements are too noisy to be regressions
+DEFAULT_COLORS = list(map(int, tenprint_components.DEFAULT_COLORS.split(',')))
+SCENE_SIZE = (80, 28)  # intro scene layout is made for this size
+
+
+# every benchmark returns `(seconds, output bytes or None)`
+
+def bench_generate(size, pattern):
+    _, elapsed = _timed(Maze.generate, size, seed=1, pattern=pattern)
+    return elapsed, None
+
+def bench_neighbours(size, pattern):
+    maze = Maze(size, seed=1, pattern=pattern, lazy=True)
+    _, elapsed = _timed(maze._calc_neighbours)
+    return elapsed, None
+
+def bench_components(size, pattern):
+    maze = Maze(size, seed=1, pattern=pattern, lazy=True).analyze(('neighbours',))
+    _, elapsed = _timed(maze._calc_components)
+    return elapsed, None
+
+def bench_vertex_belong(size, pattern):
+    maze = Maze(size, seed=1, pattern=pattern)
+    _, elapsed = _timed(maze.vertex_belong)
+    return elapsed, None
+
+def bench_render(size, pattern):
+    maze = Maze(size, seed=1, pattern=pattern)
+    rendered, elapsed = _timed(tenprint_components.render_colored_components, maze, Palette(DEFAULT_COLORS), (0, 0))
+    return elapsed, len(rendered.encode('utf-8'))
+
+def bench_scene_wave(size, pattern):
+    sink = NullSink()
+    _, elapsed = _timed(tenprint_scene_components_wave.scene, size, seed=1, sink=sink, realtime=False)
+    return elapsed, sink.stats.bytes
+
+def bench_scene_intro(size, pattern):
+    sink = NullSink()
+    _, elapsed = _timed(tenprint_scene_intro.colored_components, size, seed=1, sink=sink, realtime=False)
+    return elapsed, sink.stats.bytes
+
+# name: (function, runs for every pattern, max cells or None)
+BENCHMARKS = {
+    'generate': (bench_generate, False, None),
+    'neighbours': (bench_neighbours, True, None),
+    'components': (bench_components, True, None),
+    'vertex_belong': (bench_vertex_belong, False, None),
+    'render': (bench_render, False, None),
+    'scene_wave': (bench_scene_wave, False, 'scene'),
+    'scene_intro': (bench_scene_intro, False, 'intro'),
+}
+
+
+_call_base = 0  # traced memory before the last call of `_timed`
+
+
+def _timed(f, *args, **kwargs):
+    """Returns result of the call and its time.
+    Peak of traced memory is reset and memory allocated before is kept in `_call_base`, so peak above it covers only this call."""
+    global _call_base
+    if tracemalloc.is_tracing():
+        _call_base = tracemalloc.get_traced_memory()[0]
+        tracemalloc.reset_peak()
+    start = time.perf_counter()
+    result = f(*args, **kwargs)
+    return result, time.perf_counter() - start
+
+
+def measure(bench, size, pattern, repeat=1, memory=True):
+    """Returns record of `bench` on maze of `size` and `pattern`.
+    Time is the best of `repeat` runs. Peak memory of the timed call is measured in a separate run under `tracemalloc`."""
+    f = BENCHMARKS[bench][0]
+    best, output = None, None
+    for _ in range(repeat):
+        elapsed, output = f(size, PATTERNS[pattern])
+        best = elapsed if best is None else min(best, elapsed)
+
+    record = {'bench': bench, 'size': list(size), 'pattern': pattern, 'time': best}
+    if output is not None:
+        record['output_bytes_per_cell'] = output / (size[0] * size[1])
+    if memory:
+        tracemalloc.start()
+        f(size, PATTERNS[pattern])
+        record['peak_memory'] = tracemalloc.get_traced_memory()[1] - _call_base
+        tracemalloc.stop()
+    return record
+
+
+def plan(benches, sizes, patterns, scene_max_cells):
+    "Yields `(bench, size, pattern)` to run."
+    for bench in benches:
+        _, per_pattern, limit = BENCHMARKS[bench]
+        if limit == 'intro':
+            bench_sizes = [SCENE_SIZE]
+        elif limit == 'scene':
+            bench_sizes = [s for s in sizes if s[0] * s[1] <= scene_max_cells]
+        else:
+            bench_sizes = sizes
+        for size in bench_sizes:
+            for pattern in (patterns if per_pattern else patterns[:1]):
+                yield bench, size, pattern
+
+
+def key(record):
+    return (record['bench'], tuple(record['size']), record['pattern'])
+
+
+def compare(results, baseline, threshold, min_time=DEFAULT_MIN_TIME):
+    """Prints comparison with `baseline` results, returns list of keys slower than `threshold` times.
+    Measurements shorter than `min_time` (both old and new) are printed but never counted as regressions."""
+    base = {key(r): r for r in baseline}
+    regressions = []
+    for record in results:
+        old = base.get(key(record))
+        if old is None:
+            continue
+        ratio = record['time'] / old['time'] if old['time'] else float('inf')
+        mark = ''
+        if max(old['time'], record['time']) < min_time:
+            mark = '  (too short)' if ratio > threshold else ''
+        elif ratio > threshold:
+            mark = '  REGRESSION'
+            regressions.append(key(record))
+        print('{:<14} {:>11} {:<8} {:>9.4f}s {:>9.4f}s  x{:.2f}{}'.format(
+            record['bench'], '{}x{}'.format(*record['size']), record['pattern'], old['time'], record['time'], ratio, mark
+        ))
+    return regressions
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Benchmarks of maze generation, analysis and rendering.')
+    parser.add_argument('-S', '--sizes', type=str, default=DEFAULT_SIZES,
+        help='Comma separated maze sizes \'WxH\'. Default is \'{}\'.'.format(DEFAULT_SIZES)
+    )
+    parser.add_argument('-p', '--patterns', type=str, default=','.join(PATTERNS),
+        help='Comma separated patterns out of {}. Default is all.'.format(', '.join(PATTERNS))
+    )
+    parser.add_argument('-b', '--benches', type=str, default=','.join(BENCHMARKS),
+        help='Comma separated benchmarks out of {}. Default is all.'.format(', '.join(BENCHMARKS))
+    )
+    parser.add_argument('-r', '--repeat', type=int, default=DEFAULT_REPEAT,
+        help='Runs per measurement, best time is taken. Default is {}.'.format(DEFAULT_REPEAT)
+    )
+    parser.add_argument('--scene-max-cells', type=int, default=DEFAULT_SCENE_MAX_CELLS,
+        help='Largest maze for scene benchmarks. Default is {}.'.format(DEFAULT_SCENE_MAX_CELLS)
+    )
+    parser.add_argument('--no-memory', action='store_true', help='Skip tracemalloc runs.')
+    parser.add_argument('-o', '--output', type=str, default=None, help='JSON file for results.')
+    parser.add_argument('--baseline', type=str, default=None, help='JSON file of earlier results to compare with.')
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+        help='Slowdown ratio reported as regression. Default is {}.'.format(DEFAULT_THRESHOLD)
+    )
+    parser.add_argument('--min-time', type=float, default=DEFAULT_MIN_TIME,
+        help='Measurements shorter than this (in seconds) are not reported as regressions. Default is {}.'.format(DEFAULT_MIN_TIME)
+    )
+    args = parser.parse_args()
+
+    args.sizes = [tuple(map(int, s.split('x'))) for s in args.sizes.split(',')]
+    args.patterns = args.patterns.split(',')
+    args.benches = args.benches.split(',')
+    for p in args.patterns:
+        assert p in PATTERNS, 'Unknown pattern {!r}'.format(p)
+    for b in args.benches:
+        assert b in BENCHMARKS, 'Unknown benchmark {!r}'.format(b)
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    results = []
+    for bench, size, pattern in plan(args.benches, args.sizes, args.patterns, args.scene_max_cells):
+        record = measure(bench, size, pattern, repeat=args.repeat, memory=not args.no_memory)
+        results.append(record)
+        print('{:<14} {:>11} {:<8} {:>9.4f}s {:>12} B'.format(
+            bench, '{}x{}'.format(*size), pattern, record['time'], record.get('peak_memory', '-')
+        ), file=sys.stderr)
+
+    report = {
+        'meta': {'python': platform.python_version(), 'platform': platform.platform(), 'time': time.time()},
+        'results': results,
+    }
+    if args.output is not None:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=1)
+
+    if args.baseline is not None:
+        with open(args.baseline) as f:
+            baseline = json.load(f)['results']
+        if compare(results, baseline, args.threshold, args.min_time):
+            sys.exit(1)
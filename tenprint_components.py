@@ -1,12 +1,23 @@
 #!/usr/bin/env python3
 
 from lib.tenprint import Maze
+from lib.stream import stream_rows
+import lib.cells as cells
+import lib.mazefile as mazefile
+import lib.raster as raster
 from lib.mazepattern import MazePattern
 from lib.color import ANSIColors, Palette
+from lib.profiling import Profiler
+import lib.profiling as profiling
 
 import lib.config as config
 
+from itertools import groupby
 import argparse
+import contextlib
+import os
+import sys
+import time
 
 
 DEFAULT_CHARS = ''.join(config.DEFAULT_MAZE_CHARS)
@@ -15,11 +26,12 @@ DEFAULT_PATTERN = ''.join(config.DEFAULT_MAZE_CONNECTIVITY_PATTERN)
 DEFAULT_SIZE = ','.join(map(str, config.DEFAULT_MAZE_SIZE))
 DEFAULT_MARGIN = ','.join(map(str, [0, 0]))
 DEFAULT_COLORS = ','.join(map(str, [4, 6, 12, 218, 21, 26, 27, 127, 81, 225]))
+DEFAULT_DELAY = 0.02
 
 CLI_EPILOG = '''{bold}Maze pattern manual (-c, -f, -p options).{reset}
   
  Maze characters: -c option.
-  Maze consists of set of two characters. They are defined by -c option.
+  Maze consists of set of two (or more, up to 15) characters. They are defined by -c option.
   For example, if you want a maze from circles '●' and spaces ' ' you should specify -c '● '.
   Tip: to avoid conflicts with terminal characters, use '=' argument formatting -c='● '.
 
@@ -47,6 +59,9 @@ CLI_EPILOG = '''{bold}Maze pattern manual (-c, -f, -p options).{reset}
 
   So, the following command generates colored 10PRINT maze consists of '\\/' with original connectivity pattern
     ./tenprint_components.py -c '\\/' -p '\\/{fill}/\\/{fill}/\\{fill}\\/\\/\\/\\{fill}'
+
+  With k characters the pattern is k matrices. Matrices may also be 5x5 or 7x7 (25 or 49 characters each)
+  to connect cells two or three rows and columns apart.
 '''.format(bold='\u001b[1m', underline='\u001b[4m', reset=ANSIColors.reset, fill=DEFAULT_FILL)
 
 def parse_args():
@@ -61,24 +76,55 @@ def parse_args():
     parser.add_argument('-S', '--size', type=str, default=DEFAULT_SIZE,
         help='Size of maze in characters. Format is \'width,height\'. Default is \'{}\''.format(DEFAULT_SIZE)
     )
+    parser.add_argument('--rng', type=str, default=config.DEFAULT_MAZE_RNG, choices=cells.RNG_MODES,
+        help='Random cell generator. \'v3\' computes every cell from the seed and its position, see --origin. Default is \'{}\'.'.format(config.DEFAULT_MAZE_RNG)
+    )
+    parser.add_argument('--origin', type=str, default='0,0',
+        help='Top left cell of the shown window of the unbounded maze, \'row,column\'. Requires --rng v3.'
+    )
     parser.add_argument('-M', '--margin', type=str, default=DEFAULT_MARGIN,
         help='Top (=bottom) and left margin in characters for maze printing. Format is \'top_margin,left_margin\'.'
     )
 
     parser.add_argument('-c', '--chars', type=str, default=DEFAULT_CHARS,
-        help='Two characters which maze consists of. Default is \'{}\''.format(DEFAULT_CHARS)
+        help='Characters which maze consists of (2 to 15). Default is \'{}\''.format(DEFAULT_CHARS)
     )
     parser.add_argument('-f', '--fill', type=str, default=DEFAULT_FILL,
         help='Fill character of connectivity pattern. Default is \'{}\'.'.format(DEFAULT_FILL)
     )
     parser.add_argument('-p', '--pattern', type=str, default=DEFAULT_PATTERN,
-        help='Connectivity pattern (string of 18 characters). Default is \'{}\'.'.format(DEFAULT_PATTERN)
+        help='Connectivity pattern (string of 9, 25 or 49 characters for every maze character). Default is \'{}\'.'.format(DEFAULT_PATTERN)
     )
 
     parser.add_argument('-C', '--colors', type=str, default=DEFAULT_COLORS,
         help='Color set for components. Format is \'c1,c2,c3,...\' where ci is int (0..255) representing ansi color code. Run ansi_pallette.py for full list of codes. Default is \'{}\'.'.format(DEFAULT_COLORS)
     )
 
+    parser.add_argument('-o', '--output', type=str, default='-',
+        help='File to write the maze to. Default is \'-\' (standard output).'
+    )
+    parser.add_argument('--load', type=str, default=None,
+        help='Render maze from file saved by --save instead of generating it (-s, -S, -c, -f, -p are ignored).'
+    )
+    parser.add_argument('--save', type=str, default=None,
+        help='Save the maze to binary file.'
+    )
+    parser.add_argument('--export', type=str, default=None,
+        help='Write the maze as PNG (.png) or PPM (.ppm) image instead of printing it. Colors of -C are used.'
+    )
+    parser.add_argument('--scale', type=int, default=raster.DEFAULT_SCALE,
+        help='Pixels per maze character for --export. Default is {}.'.format(raster.DEFAULT_SCALE)
+    )
+    parser.add_argument('--profile', nargs='?', const='time', choices=('time', 'memory'), default=None,
+        help='Print time of every phase to standard error. \'--profile memory\' also traces allocations (much slower).'
+    )
+    parser.add_argument('--stream', action='store_true',
+        help='Print endless maze row by row until interrupted (Ctrl-C). Height of --size is ignored.'
+    )
+    parser.add_argument('--delay', type=float, default=DEFAULT_DELAY,
+        help='Pause between rows in seconds for --stream. Default is {}.'.format(DEFAULT_DELAY)
+    )
+
     args = parser.parse_args()
 
     if args.seed is not None:
@@ -88,39 +134,86 @@ def parse_args():
     if len(args.size) != 2:
         raise ValueError('Specified `size` is not two comma separated integers.')
 
+    args.origin = tuple(map(int, args.origin.split(',')))
+    if len(args.origin) != 2:
+        raise ValueError('Specified `origin` is not two comma separated integers.')
+    assert args.origin == (0, 0) or args.rng == cells.RNG_V3, '--origin requires --rng v3.'
+
     args.margin = tuple(map(int, args.margin.split(',')))
     if len(args.margin) != 2:
         raise ValueError('Specified `margin` is not two comma separated integers.')
 
 
-    assert len(args.chars) == 2, '--chars must be two-character string.'
+    assert 2 <= len(args.chars) <= 15, '--chars must be string of 2 to 15 characters.'
     args.chars = tuple(args.chars)
 
     assert len(args.fill) == 1, '--fill must be one-character string.'
 
-    assert len(args.pattern) == 18, '--pattern must be 18-character string.'
-    args.pattern = (args.pattern[:9], args.pattern[9:])
+    window = len(args.pattern) // len(args.chars)
+    assert window in (9, 25, 49) and window * len(args.chars) == len(args.pattern), \
+        '--pattern must be string of 9, 25 or 49 characters for every maze character.'
+    args.pattern = tuple(args.pattern[c*window:(c+1)*window] for c in range(len(args.chars)))
 
     args.colors = list(map(int, args.colors.split(',')))
 
+    assert not (args.load and args.save and os.path.exists(args.save) and os.path.samefile(args.load, args.save)), \
+        '--save must differ from --load.'
+
+    assert args.export is None or not args.stream, '--export cannot be used with --stream.'
+    assert args.scale > 0, '--scale must be positive.'
+
     return args
 
 
-def scene_colored_components(maze_size, pattern=None, seed=None, colors=None, margin=None):
-    margintop, marginleft = margin
+def colored_line(row, color_indices, colors):
+    "Returns `row` of chars colored by `color_indices` of `colors`. Color escape is written only where color changes."
+    parts = []
+    j = 0
+    for color, run in groupby(color_indices):
+        k = len(list(run))
+        parts.append(colors[color])
+        parts.append(row[j:j+k])
+        j += k
+    return ''.join(parts) + ANSIColors.reset
+
 
-    maze = Maze(size=maze_size, seed=seed, pattern=pattern)
-    vertex_belong = maze.vertex_belong()
+def render_colored_components(maze, colors, margin=(0, 0)):
+    "Returns the whole `maze` colored by components as one string, `colors` is `Palette`."
+    margintop, marginleft = margin
+    w = maze.size.width
+    labels = maze.labels_view()
+
+    lines = [margintop * '\n']
+    for i, row in enumerate(maze.maze):
+        lines.append(marginleft * ' ' + colored_line(row, colors.indices(labels[i*w:(i+1)*w]), colors) + '\n')
+    lines.append(margintop * '\n')
+    return ''.join(lines)
+
+
+def scene_colored_components(maze_size, pattern=None, seed=None, colors=None, margin=None, out=sys.stdout, maze=None):
+    "Prints maze colored by components. Maze is generated unless `maze` is given."
+    if maze is None:
+        maze = Maze(size=maze_size, seed=seed, pattern=pattern)
+    with profiling.phase('render'):
+        frame = render_colored_components(maze, Palette(colors), margin)
+    with profiling.phase('write'):
+        out.write(frame)
+        out.flush()
+
+
+def scene_stream(maze_width, pattern=None, seed=None, colors=None, margin=None, delay=DEFAULT_DELAY, out=sys.stdout,
+        rng=config.DEFAULT_MAZE_RNG):
+    marginleft = margin[1]
     colors = Palette(colors)
-    
-    print(margintop * '\n', end='')
-    for i in range(maze.size.height):
-        print(marginleft * ' ', end='')
-        for j in range(maze.size.width):
-            color = colors[vertex_belong[i][j] % len(colors)]
-            print(color + maze.maze[i][j], end='')
-        print(ANSIColors.reset)
-    print(margintop * '\n', end='')
+
+    try:
+        for row, labels in stream_rows(maze_width, seed=seed, pattern=pattern, rng=rng):
+            color_indices = colors.indices(labels)
+            out.write(marginleft * ' ' + colored_line(row, color_indices, colors) + '\n')
+            out.flush()
+            time.sleep(delay)
+    except KeyboardInterrupt:
+        out.write(ANSIColors.reset + '\n')
 
 
 if __name__ == '__main__':
@@ -130,4 +223,21 @@ if __name__ == '__main__':
         fill=args.fill,
         pattern=args.pattern
     )
-    scene_colored_components(maze_size=args.size, seed=args.seed, pattern=mp, colors=args.colors, margin=args.margin)
+    out = sys.stdout if args.output == '-' else open(args.output, 'w', encoding='utf-8')
+    profiler = Profiler(memory=args.profile == 'memory') if args.profile else contextlib.nullcontext()
+    with out, profiler:
+        if args.stream:
+            scene_stream(maze_width=args.size[0], seed=args.seed, pattern=mp, colors=args.colors, margin=args.margin, delay=args.delay, out=out, rng=args.rng)
+        else:
+            if args.load is not None:
+                maze = mazefile.load(args.load)
+            else:
+                maze = Maze(size=args.size, seed=args.seed, pattern=mp, rng=args.rng, origin=args.origin)
+            if args.save is not None:
+                mazefile.save(maze, args.save)
+            if args.export is not None:
+                raster.export(maze, args.export, args.colors, args.scale)
+            else:
+                scene_colored_components(maze_size=maze.size, colors=args.colors, margin=args.margin, out=out, maze=maze)
+    if args.profile:
+        print(profiler.format(), file=sys.stderr)
@@ -0,0 +1,190 @@
+#!/usr/bin/env python3
+
+from lib.tenprint import Maze
+from lib.mazepattern import PATTERNS
+import lib.cells as cells
+
+import lib.config as config
+
+from concurrent.futures import ProcessPoolExecutor, FIRST_COMPLETED, wait
+import argparse
+import csv
+import json
+import os
+import sys
+
+
+DEFAULT_SIZES = '100x100'
+DEFAULT_PATTERNS = '10print'
+FIELDS = ('seed', 'width', 'height', 'pattern', 'rng', 'components', 'largest', 'spans_vertical', 'spans_horizontal', 'histogram')
+KEY_FIELDS = FIELDS[:5]
+
+
+def summarize(task):
+    """Returns summary record of maze of `task = (seed, (width, height), pattern name, rng)`.
+    `histogram` is list of `[component size, number of components]` pairs."""
+    seed, (width, height), pattern, rng = task
+    stats = Maze((width, height), seed=seed, pattern=PATTERNS[pattern], rng=rng).stats()
+    return {
+        'seed': seed, 'width': width, 'height': height, 'pattern': pattern, 'rng': rng,
+        'components': sum(stats.histogram.values()),
+        'largest': stats.sizes[stats.largest] if stats.largest is not None else 0,
+        'spans_vertical': bool(stats.vertical),
+        'spans_horizontal': bool(stats.horizontal),
+        'histogram': sorted(map(list, stats.histogram.items())),
+    }
+
+
+def plan(seeds, sizes, patterns, rng=config.DEFAULT_MAZE_RNG, done=()):
+    "Yields tasks for `summarize`, skipping keys of records in `done`."
+    for size in sizes:
+        for pattern in patterns:
+            for seed in seeds:
+                if (seed, size[0], size[1], pattern, rng) not in done:
+                    yield seed, tuple(size), pattern, rng
+
+
+def run(tasks, workers=None, window=None):
+    """Yields records of `tasks` in order of completion.
+    At most `window` tasks (default is four per worker) are submitted ahead, so `tasks` may be endless."""
+    workers = workers or os.cpu_count() or 1
+    window = window or 4 * workers
+    tasks = iter(tasks)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = set()
+        while True:
+            for task in tasks:
+                pending.add(executor.submit(summarize, task))
+                if len(pending) >= window:
+                    break
+            if not pending:
+                return
+            finished, pending = wait(pending, return_when=FIRST_COMPLETED)
+            for future in finished:
+                yield future.result()
+
+
+class RecordWriter(object):
+    """Appends records to CSV (`.csv`) or JSON lines (any other extension) file, one flushed line per record.
+
+    The file is its own checkpoint: `done` holds keys of records already written,
+    an incomplete last line (of an interrupted run) is cut off.
+    `recovered` holds `(key, spans_vertical)` of records found in the file on opening.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.csv = path.endswith('.csv')
+        self.done = set()
+        self.recovered = []
+        fresh = not os.path.exists(path) or os.path.getsize(path) == 0
+        if not fresh:
+            self._recover()
+        self._file = open(path, 'a', newline='', encoding='utf-8')
+        if self.csv:
+            self._csv = csv.DictWriter(self._file, FIELDS)
+            if fresh:
+                self._csv.writeheader()
+
+    def _recover(self):
+        with open(self.path, 'rb+') as f:
+            data = f.read()
+            f.truncate(data.rfind(b'\n') + 1)
+        lines = data[:data.rfind(b'\n') + 1].decode('utf-8').splitlines()
+        if self.csv:
+            records = csv.DictReader(lines)
+            for record in records:
+                key = (int(record['seed']), int(record['width']), int(record['height']), record['pattern'], record['rng'])
+                self.done.add(key)
+                self.recovered.append((key, record['spans_vertical'] == 'True'))
+        else:
+            for line in lines:
+                record = json.loads(line)
+                key = tuple(record[field] for field in KEY_FIELDS)
+                self.done.add(key)
+                self.recovered.append((key, record['spans_vertical']))
+
+    def write(self, record):
+        if self.csv:
+            self._csv.writerow(dict(record, histogram=json.dumps(record['histogram'])))
+        else:
+            self._file.write(json.dumps(record) + '\n')
+        self._file.flush()
+        self.done.add(tuple(record[field] for field in KEY_FIELDS))
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def parse_range(text):
+    "Returns list of integers of 'a,b,c-d' (ranges are inclusive)."
+    values = []
+    for part in text.split(','):
+        first, _, last = part.partition('-')
+        values.extend(range(int(first), int(last or first) + 1))
+    return values
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(description='Connectivity statistics of many mazes, computed in a process pool.')
+    parser.add_argument('-s', '--seeds', type=str, default='0-99',
+        help='Seeds as comma separated integers and inclusive ranges \'a-b\'. Default is \'0-99\'.'
+    )
+    parser.add_argument('-S', '--sizes', type=str, default=DEFAULT_SIZES,
+        help='Comma separated maze sizes \'WxH\'. Default is \'{}\'.'.format(DEFAULT_SIZES)
+    )
+    parser.add_argument('-p', '--patterns', type=str, default=DEFAULT_PATTERNS,
+        help='Comma separated patterns out of {}. Default is \'{}\'.'.format(', '.join(PATTERNS), DEFAULT_PATTERNS)
+    )
+    parser.add_argument('--rng', type=str, default=config.DEFAULT_MAZE_RNG, choices=cells.RNG_MODES,
+        help='Random cell generator. Default is \'{}\'.'.format(config.DEFAULT_MAZE_RNG)
+    )
+    parser.add_argument('-w', '--workers', type=int, default=None, help='Worker processes. Default is number of CPUs.')
+    parser.add_argument('-o', '--output', type=str, required=True,
+        help='Results file, CSV if it ends with \'.csv\' and JSON lines otherwise. Finished records are skipped on rerun.'
+    )
+    args = parser.parse_args()
+
+    args.seeds = parse_range(args.seeds)
+    args.sizes = [tuple(map(int, s.split('x'))) for s in args.sizes.split(',')]
+    args.patterns = args.patterns.split(',')
+    for p in args.patterns:
+        assert p in PATTERNS, 'Unknown pattern {!r}'.format(p)
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+
+    spanning = {}  # (width, height, pattern, rng): [mazes, spanning mazes] of this run's seeds, sizes and patterns
+    seeds, sizes, patterns = set(args.seeds), set(args.sizes), set(args.patterns)
+    with RecordWriter(args.output) as writer:
+        skipped = 0
+        for (seed, width, height, pattern, rng), spans in writer.recovered:
+            if seed in seeds and (width, height) in sizes and pattern in patterns and rng == args.rng:
+                entry = spanning.setdefault((width, height, pattern, rng), [0, 0])
+                entry[0] += 1
+                entry[1] += spans
+                skipped += 1
+        tasks = plan(args.seeds, args.sizes, args.patterns, args.rng, writer.done)
+        try:
+            for record in run(tasks, args.workers):
+                writer.write(record)
+                entry = spanning.setdefault((record['width'], record['height'], record['pattern'], record['rng']), [0, 0])
+                entry[0] += 1
+                entry[1] += record['spans_vertical']
+        except KeyboardInterrupt:
+            print('Interrupted, rerun the same command to resume.', file=sys.stderr)
+
+    if skipped:
+        print('{} records were done before, they are included below.'.format(skipped), file=sys.stderr)
+    for (width, height, pattern, rng), (mazes, spans) in sorted(spanning.items()):
+        print('{:>11} {:<8} {:<3} {:>7} mazes, spanning probability {:.3f}'.format(
+            '{}x{}'.format(width, height), pattern, rng, mazes, spans / mazes
+        ), file=sys.stderr)
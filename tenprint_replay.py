@@ -0,0 +1,31 @@
+#!/usr/bin/env python3
+
+import lib.asciicast as asciicast
+from lib.color import ANSIColors
+
+import argparse
+import sys
+
+
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description='Replays scene recorded with --record of tenprint_scene_*.py (any asciicast v2 file) without computing it.'
+    )
+    parser.add_argument('path', type=str, help='Cast file, gzip-compressed if it ends with \'.gz\'.')
+    parser.add_argument('--speed', type=float, default=1.0, help='Playback speed factor. Default is 1.')
+    parser.add_argument('--fps', type=int, default=60, help='Frame rate of playback. Default is 60.')
+    parser.add_argument('--loop', action='store_true', help='Replay until interrupted (Ctrl-C).')
+    args = parser.parse_args()
+    assert args.speed > 0, '--speed must be positive.'
+    return args
+
+
+if __name__ == '__main__':
+    args = parse_args()
+    try:
+        while True:
+            asciicast.replay(args.path, speed=args.speed, fps=args.fps)
+            if not args.loop:
+                break
+    except KeyboardInterrupt:
+        sys.stdout.write(ANSIColors.reset + '\n')
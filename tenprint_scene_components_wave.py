@@ -1,11 +1,14 @@
 #!/usr/bin/env python3
 
 from collections import deque
-import time, sys
 
 from lib.tenprint import Maze
 from lib.color import ANSIColors
 from lib.screen import Screen
+from lib.scheduler import FrameScheduler
+from lib.asciicast import CastSink
+
+import argparse
 
 
 def write_char_colored(scr, char, at:tuple, color:str):
@@ -24,10 +27,17 @@ def neighbours_sequence_dfs(maze, u, p=-1, sequence=None, visited=None):
     ui, uj = u
     visited[ui][uj] = True
     sequence.append(u)
-    for v in maze.neighbours(u):
-        vi, vj = v
-        if not visited[vi][vj]:
-            neighbours_sequence_dfs(maze, v, u, sequence, visited)
+    stack = [iter(maze.neighbours(u))]  # explicit stack instead of recursion, large components overflow it
+    while stack:
+        for v in stack[-1]:
+            vi, vj = v
+            if not visited[vi][vj]:
+                visited[vi][vj] = True
+                sequence.append(v)
+                stack.append(iter(maze.neighbours(v)))
+                break
+        else:
+            stack.pop()
     return sequence
 
 
@@ -47,27 +57,71 @@ def neighbours_sequence_wave(maze:Maze, start:tuple):
             sequence.append(neighbours)
     return sequence
 
-def scene(maze_size=(80, 28), seed=None):
+def layers(order, depths, start:int, stop:int):
+    "Yields runs of `order[start:stop]` of equal depth."
+    while start < stop:
+        depth, end = depths[start], start + 1
+        while end < stop and depths[end] == depth:
+            end += 1
+        yield order[start:end]
+        start = end
+
+def wave_steps(scr, maze, colors, dt=3e-3, concurrent=False):
+    """Highlights breadth-first layers of components, largest component first.
+    With `concurrent` every component advances one layer per step."""
+    order, depths, offsets = maze.waves()
+    width = maze.size.width
+    ranking = maze.stats().ranking()
+
+    if not concurrent:
+        for icomp, c in enumerate(ranking):
+            color = colors[icomp % len(colors)]
+            for layer in layers(order, depths, offsets[c], offsets[c+1]):
+                highlight(scr, maze, (divmod(u, width) for u in layer), color=color)
+                yield dt
+        return
+
+    rank = [0] * len(ranking)
+    for icomp, c in enumerate(ranking):
+        rank[c] = icomp
+    labels = maze.labels_view()
+    by_depth = [[] for _ in range(max(depths, default=-1) + 1)]
+    for u, depth in zip(order, depths):
+        by_depth[depth].append(u)
+    for layer in by_depth:
+        for u in layer:
+            write_char_colored(scr, maze.maze[u // width][u % width], divmod(u, width), colors[rank[labels[u]] % len(colors)])
+        yield dt
+
+
+def scene(maze_size=(80, 28), seed=None, fps=60, sink=None, realtime=True, concurrent=False, record=None):
+    """Plays the scene to `sink` (standard output by default). Returns `FrameStats`.
+    With `concurrent` all components spread at once.
+    With `record` the scene is recorded to cast file at this path without waiting (and output only to given `sink`),
+    see `lib.asciicast`."""
     maze = Maze(size=maze_size, seed=seed)
-    scr = Screen(*maze.size)
-    
-    components = sorted(maze.components(), key=len, reverse=True)
+    if record is not None:
+        sink = CastSink(record, maze.size.width, maze.size.height + 1, sink)
+        realtime = False
+    scr = Screen(*maze.size, buffered=True, sink=sink)
 
     colors = ANSIColors.blues + ANSIColors.pinks
 
-    for (icomp, comp) in enumerate(components):
-        start = comp.pop()
-        comp.add(start)
-
-        color = colors[icomp % len(colors)]
-        sequence_wave = neighbours_sequence_wave(maze, start)
-        for packet in sequence_wave:
-            highlight(scr, maze, packet, color=color)
-            sys.stdout.flush()
-            time.sleep(3e-3)
+    scheduler = FrameScheduler(fps, present=scr.present, realtime=realtime)
+    if record is not None:
+        sink.clock = lambda: scheduler.time
+    stats = scheduler.run(wave_steps(scr, maze, colors, concurrent=concurrent))
 
     scr.cursor_move_outside()
+    if record is not None:
+        sink.close()
+    return stats
 
 
 if __name__ == "__main__":
-    scene((80, 28), seed=1)
+    parser = argparse.ArgumentParser(description='Scene of 10PRINT maze components spreading as waves.')
+    parser.add_argument('--record', type=str, default=None,
+        help='Record the scene to asciicast file (gzip-compressed if it ends with \'.gz\') instead of playing it, see tenprint_replay.py.'
+    )
+    args = parser.parse_args()
+    scene((80, 28), seed=1, record=args.record)
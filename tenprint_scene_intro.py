@@ -1,34 +1,40 @@
 #!/usr/bin/env python3
 
 from lib.tenprint import Maze
-from lib.color import ANSIColors
+from lib.color import ANSIColors, Palette
 from lib.screen import Screen
+from lib.scheduler import FrameScheduler
+from lib.asciicast import CastSink
 
-import time, sys, random
+import argparse
+import random
 
 
 class ColoredMazeComponents(Maze):
     colors = None
-    color_matrix = None
+    _color_indices = None
 
     def __init__(self, size, seed=1, colors=[ANSIColors.white]):
-        super().__init__(size, seed=seed)
-        
-        self.colors = colors
-        self._init_color_matrix()
+        super().__init__(size, seed=seed, lazy=True)  # components are needed only for colored columns
 
-    def _init_color_matrix(self):
-        self.color_matrix = self.fill_matrix(None)
-        for i in range(self.size.height):
-            for j in range(self.size.width):
-                self.color_matrix[i][j] = self.colors[self._vertex_belong[i][j] % len(self.colors)]
+        self.colors = colors if isinstance(colors, Palette) else Palette(colors)
+
+    @property
+    def color_indices(self):
+        "Row-major `bytes` of color index of every cell in `colors`."
+        if self._color_indices is None:
+            self._color_indices = self.colors.indices(self.labels())
+        return self._color_indices
+
+    def color(self, i, j):
+        return self.colors[self.color_indices[i * self.size.width + j]]
 
 def translate(ij, didj):
     return (ij[0] + didj[0], ij[1] + didj[1])
 
 def display_column(maze, scr, j, trans=(0, 0)):
     for i in range(maze.size.height):
-        color = maze.color_matrix[i][j]
+        color = maze.color(i, j)
         scr.write_ansi_markup(color, at=translate((i, j), trans))
         scr.write_char(maze.maze[i][j], at=translate((i, j), trans))
 
@@ -37,76 +43,94 @@ def hide_column(maze, scr, j, trans=(0, 0)):
         scr.write_ansi_markup(ANSIColors.from_code(237), at=(i, j))
         scr.write_char(maze.maze[i][j], at=translate((i, j), trans))
 
-def pause(sec):
-    sys.stdout.flush()
-    time.sleep(sec)
-
 def anim_intro(maze, scr, thick, dt, trans):
     for j in range(thick):
         display_column(maze, scr, j, trans=trans)
-        pause(dt)
+        yield dt
 
 def anim_outro(maze, scr, thick, dt, trans):
     for j in range(maze.size.width-thick, maze.size.width):
         hide_column(maze, scr, j, trans=trans)
-        pause(dt)
+        yield dt
 
 def anim_go_right(maze, scr, thick, dt, trans):
     for j in range(thick, maze.size.width):
         display_column(maze, scr, j, trans=trans)
         hide_column(maze, scr, j - thick, trans=trans)
-        pause(dt)
+        yield dt
 
 def anim_go_left(maze, scr, thick, dt, trans):
     for j in range(maze.size.width-thick-1, -1, -1):
         display_column(maze, scr, j, trans=trans)
         hide_column(maze, scr, j + thick, trans=trans)
-        pause(dt)
+        yield dt
 
 def bounce(maze, scr, thick, dt, trans, times=1):
     t = 0
     while t <= times:
         if t % 2 == 1:
-            anim_go_left(maze, scr, thick, dt, trans)
+            yield from anim_go_left(maze, scr, thick, dt, trans)
         else:
-            anim_go_right(maze, scr, thick, dt, trans)
+            yield from anim_go_right(maze, scr, thick, dt, trans)
         t += 1
-        pause(dt)
-
-
-def colored_components(maze_size=(80, 28), seed=None):
-    random.seed(seed)
-    
-    colors = ANSIColors.blues + ANSIColors.pinks
-    random.shuffle(colors)
-
-    maze = ColoredMazeComponents(size=maze_size, seed=seed, colors=colors) 
-
-    margintop = (40 - maze_size[1]) // 2 - 2
-    marginleft = (100 - maze_size[0]) // 2
-    margin = (margintop, marginleft)
+        yield dt
 
-    scr = Screen(width=maze.size.width + 2*marginleft, height=maze.size.height + 2*margintop)
 
+def intro_steps(maze, scr, margin):
     for j in range(maze.size.width):
         hide_column(maze, scr, j, trans=margin)
 
-    pause(1)
+    yield 1
 
     thick = 3
     dt = 0.03
 
     for t in range(3):
         thick = min(10 + 5*t**2, maze.size.width)
-        anim_intro(maze, scr, thick, dt, margin)
-        anim_go_right(maze, scr, thick, dt, margin)
-        anim_outro(maze, scr, thick, dt, margin)
+        yield from anim_intro(maze, scr, thick, dt, margin)
+        yield from anim_go_right(maze, scr, thick, dt, margin)
+        yield from anim_outro(maze, scr, thick, dt, margin)
         dt *= 0.8
 
-    anim_intro(maze, scr, 80, 0.03, margin)
+    yield from anim_intro(maze, scr, 80, 0.03, margin)
+    yield 1
+
+
+def colored_components(maze_size=(80, 28), seed=None, fps=60, sink=None, realtime=True, record=None):
+    """Plays the scene to `sink` (standard output by default). Returns `FrameStats`.
+    With `record` the scene is recorded to cast file at this path without waiting (and output only to given `sink`),
+    see `lib.asciicast`."""
+    colors = ANSIColors.blues + ANSIColors.pinks
+    random.Random(seed).shuffle(colors)
+
+    maze = ColoredMazeComponents(size=maze_size, seed=seed, colors=colors) 
+
+    margintop = (40 - maze_size[1]) // 2 - 2
+    marginleft = (100 - maze_size[0]) // 2
+    margin = (margintop, marginleft)
+
+    width, height = maze.size.width + 2*marginleft, maze.size.height + 2*margintop
+    if record is not None:
+        sink = CastSink(record, width, height + 1, sink)
+        realtime = False
+    scr = Screen(width=width, height=height, buffered=True, sink=sink)
+
+    scheduler = FrameScheduler(fps, present=scr.present, realtime=realtime)
+    if record is not None:
+        sink.clock = lambda: scheduler.time
+    stats = scheduler.run(intro_steps(maze, scr, margin))
 
     scr.cursor_move_outside()
     scr.write_ansi_markup(ANSIColors.reset)
-    pause(1)
-
-colored_components(seed=0)
+    if record is not None:
+        sink.close()
+    return stats
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Intro scene of colored 10PRINT maze components.')
+    parser.add_argument('--record', type=str, default=None,
+        help='Record the scene to asciicast file (gzip-compressed if it ends with \'.gz\') instead of playing it, see tenprint_replay.py.'
+    )
+    args = parser.parse_args()
+    colored_components(seed=0, record=args.record)